@@ -1,3 +1,4 @@
+import os
 from pathlib import Path
 
 from server.server import app
@@ -14,5 +15,5 @@ if __name__ == "__main__":
         port=8000,
         # reload=True,
         # access_log=False,
-        workers=1,
+        workers=int(os.getenv("WEB_CONCURRENCY", 1)),
     )
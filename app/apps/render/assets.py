@@ -0,0 +1,243 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+from dataclasses import asdict, dataclass
+from io import BytesIO
+from pathlib import Path
+
+import aiofiles
+from fastapi_mongo_base.utils import imagetools
+from PIL import Image
+from server.cache import LRUCache
+from server.clients import clients
+from server.config import Settings
+from server.executor import cpu_executor
+from server.metrics import timed
+
+
+@dataclass
+class Asset:
+    url: str
+    digest: str
+    data_url: str
+    etag: str | None = None
+    last_modified: str | None = None
+    validated_at: float = 0
+
+    @property
+    def size(self) -> int:
+        return len(self.data_url)
+
+    def is_fresh(self, max_age: float) -> bool:
+        return time.time() - self.validated_at < max_age
+
+    def validation_headers(self) -> dict[str, str]:
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+def encode_image(content: bytes) -> str:
+    image = imagetools.strip_metadata(Image.open(BytesIO(content)))
+    return imagetools.image_to_base64(image, quality=Settings.ASSET_JPEG_QUALITY)
+
+
+def encode_data_url(url: str) -> str:
+    return imagetools.image_to_base64(
+        imagetools.strip_metadata(imagetools.load_from_base64(url)),
+        quality=Settings.ASSET_JPEG_QUALITY,
+    )
+
+
+class AssetCache:
+    """Download-once cache of render assets (images, logos) keyed by url.
+
+    Entries live in a memory LRU bounded by `max_bytes` and, when `directory`
+    is set, on disk: encoded images are stored by content digest under
+    `objects/`, and url metadata (digest, ETag, Last-Modified) under `urls/`.
+    Once the disk tier passes `max_disk_bytes`, its least recently used files
+    are deleted down to 90% of it; disk writes run on the thread executor.
+    Entries older than `max_age` are revalidated with a conditional request,
+    and concurrent misses for the same url share a single download.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int,
+        directory: Path | None = None,
+        max_age: float = 3600,
+        max_disk_bytes: int = 0,
+    ):
+        self.directory = directory
+        self.max_age = max_age
+        self.max_disk_bytes = max_disk_bytes
+        # estimated size of the disk tier, None until it is first scanned
+        self._disk_bytes: int | None = None
+        self._evicting = False
+        self._memory = LRUCache(None, max_bytes=max_bytes, sizeof=lambda a: a.size)
+        self._inflight: dict[str, asyncio.Task] = {}
+
+    @staticmethod
+    def _hash(value: str | bytes) -> str:
+        if isinstance(value, str):
+            value = value.encode()
+        return hashlib.sha256(value).hexdigest()
+
+    def _object_path(self, digest: str) -> Path:
+        return self.directory / "objects" / digest[:2] / digest
+
+    def _url_path(self, url: str) -> Path:
+        return self.directory / "urls" / f"{self._hash(url)}.json"
+
+    async def _read_disk(self, url: str) -> Asset | None:
+        if self.directory is None:
+            return None
+        try:
+            async with aiofiles.open(self._url_path(url)) as f:
+                meta = json.loads(await f.read())
+            object_path = self._object_path(meta["digest"])
+            async with aiofiles.open(object_path) as f:
+                asset = Asset(**meta, data_url=await f.read())
+            # marks the object as recently used for eviction
+            await cpu_executor.run_thread(os.utime, object_path)
+            return asset
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    def _store(self, asset: Asset, write_object: bool) -> int:
+        """Write `asset` to disk and return the bytes written."""
+        written = 0
+        if write_object:
+            object_path = self._object_path(asset.digest)
+            if not object_path.exists():
+                object_path.parent.mkdir(parents=True, exist_ok=True)
+                written += object_path.write_text(asset.data_url)
+
+        url_path = self._url_path(asset.url)
+        url_path.parent.mkdir(parents=True, exist_ok=True)
+        meta = asdict(asset)
+        meta.pop("data_url")
+        return written + url_path.write_text(json.dumps(meta))
+
+    def _evict(self) -> int:
+        """Delete least recently used files until the disk tier is under 90%
+        of `max_disk_bytes`, and return its size."""
+        files = []
+        for path in self.directory.rglob("*"):
+            try:
+                if path.is_file():
+                    stat = path.stat()
+                    files.append((stat.st_mtime, stat.st_size, path))
+            except OSError:
+                continue
+
+        total = sum(size for _, size, _ in files)
+        target = self.max_disk_bytes * 0.9
+        for _, size, path in sorted(files):
+            if total <= target:
+                break
+            # url metadata left without its object reads as a miss
+            path.unlink(missing_ok=True)
+            total -= size
+        return total
+
+    async def _write_disk(self, asset: Asset, write_object: bool = True):
+        if self.directory is None:
+            return
+        try:
+            written = await cpu_executor.run_thread(self._store, asset, write_object)
+        except OSError as e:
+            logging.warning(f"Could not write asset cache for {asset.url}: {e}")
+            return
+
+        if self._disk_bytes is not None:
+            self._disk_bytes += written
+        if not self.max_disk_bytes or self._evicting:
+            return
+        if self._disk_bytes is None or self._disk_bytes > self.max_disk_bytes:
+            self._evicting = True
+            try:
+                self._disk_bytes = await cpu_executor.run_thread(self._evict)
+            except OSError as e:
+                logging.warning(f"Could not clean up the asset cache: {e}")
+            finally:
+                self._evicting = False
+
+    async def _fetch(self, url: str, cached: Asset | None) -> Asset:
+        headers = cached.validation_headers() if cached else {}
+        with timed("asset_download"):
+            r = await clients.assets.get(url, headers=headers)
+            if r.status_code != 304 or not cached:
+                r.raise_for_status()
+        if r.status_code == 304 and cached:
+            cached.validated_at = time.time()
+            self._memory.set(url, cached)
+            await self._write_disk(cached, write_object=False)
+            return cached
+
+        digest = self._hash(r.content)
+        if cached and cached.digest == digest:
+            data_url = cached.data_url
+        else:
+            with timed("asset_encode"):
+                data_url = await cpu_executor.run(encode_image, r.content)
+        asset = Asset(
+            url=url,
+            digest=digest,
+            data_url=data_url,
+            etag=r.headers.get("ETag"),
+            last_modified=r.headers.get("Last-Modified"),
+            validated_at=time.time(),
+        )
+        self._memory.set(url, asset)
+        await self._write_disk(asset)
+        return asset
+
+    async def get(self, url: str) -> Asset:
+        cached = self._memory.get(url)
+        if cached is None:
+            cached = await self._read_disk(url)
+            if cached is not None:
+                self._memory.set(url, cached)
+        if cached is not None and cached.is_fresh(self.max_age):
+            return cached
+
+        task = self._inflight.get(url)
+        if task is None:
+            task = asyncio.ensure_future(self._fetch(url, cached))
+            self._inflight[url] = task
+            task.add_done_callback(lambda _: self._inflight.pop(url, None))
+        return await asyncio.shield(task)
+
+    async def put(self, url: str, content: bytes):
+        """Cache `content` for `url` without downloading it, e.g. after an upload."""
+        with timed("asset_encode"):
+            data_url = await cpu_executor.run(encode_image, content)
+        asset = Asset(
+            url=url,
+            digest=self._hash(content),
+            data_url=data_url,
+            validated_at=time.time(),
+        )
+        self._memory.set(url, asset)
+        await self._write_disk(asset)
+
+    async def get_base64(self, url: str) -> str:
+        return (await self.get(url)).data_url
+
+    def clear(self):
+        self._memory.clear()
+
+
+asset_cache = AssetCache(
+    max_bytes=Settings.ASSET_CACHE_MAX_BYTES,
+    directory=Path(Settings.ASSET_CACHE_DIR) if Settings.ASSET_CACHE_DIR else None,
+    max_age=Settings.ASSET_CACHE_MAX_AGE,
+    max_disk_bytes=Settings.ASSET_CACHE_DIR_MAX_BYTES,
+)
@@ -0,0 +1,230 @@
+"""Pillow compositor for simple MWJ templates.
+
+This runs in executor worker processes, so it depends only on Pillow. Fonts
+and decoded layer images are cached per process between calls.
+
+The schema below is a deliberate subset defined by this module, not a
+description of the full MWJ format the remote renderer accepts: templates
+authored in it can be composited locally, and the whitelist keeps everything
+else off this path. The subset understood here is::
+
+    {
+        "width": 600,
+        "height": 400,
+        "background": "#ffffff",
+        "layers": [
+            {"type": "color", "color": "#ff0000", "x": 0, "y": 0,
+             "width": 600, "height": 40},
+            {"type": "image", "src": "data:image/png;base64,...",
+             "x": 0, "y": 0, "width": 600, "height": 400, "fit": "cover"},
+            {"type": "logo", ...},
+            {"type": "text", "text": "...", "font": "Vazirmatn", "size": 32,
+             "color": "#000000", "x": 10, "y": 10, "width": 580,
+             "align": "center"},
+        ],
+    }
+
+Layer geometry defaults to the whole canvas, and image layers without a
+`src` are skipped. Templates using any other key or value, which may mean a
+different layout scheme, are left to the remote renderer.
+"""
+
+import base64
+import functools
+import unicodedata
+from io import BytesIO
+from pathlib import Path
+
+from PIL import Image, ImageColor, ImageDraw, ImageFont, ImageOps, features
+
+CANVAS_KEYS = {"width", "height", "background", "layers"}
+GEOMETRY_KEYS = {"x", "y", "width", "height"}
+IMAGE_KEYS = {"type", "src", "fit"} | GEOMETRY_KEYS
+LAYER_KEYS = {
+    "color": {"type", "color"} | GEOMETRY_KEYS,
+    "image": IMAGE_KEYS,
+    "logo": IMAGE_KEYS,
+    "text": {"type", "text", "font", "size", "color", "align"} | GEOMETRY_KEYS,
+}
+CHOICES = {"fit": {"contain", "cover", "fill"}, "align": {"left", "center", "right"}}
+FONT_SUFFIXES = {".ttf", ".otf"}
+MAX_SIZE = 8192
+
+
+@functools.lru_cache(maxsize=None)
+def font_files(fonts_dir: str) -> dict[str, str]:
+    """Font paths by lowercase name; `Name-Regular.ttf` also answers `Name`."""
+    fonts = {}
+    directory = Path(fonts_dir)
+    paths = sorted(directory.iterdir()) if fonts_dir and directory.is_dir() else []
+    for path in paths:
+        if path.suffix.lower() not in FONT_SUFFIXES:
+            continue
+        name = path.stem.lower()
+        fonts[name] = str(path)
+        family = name.split("-")[0]
+        if family not in fonts or name.endswith("-regular"):
+            fonts[family] = str(path)
+    return fonts
+
+
+def find_font(fonts_dir: str, name) -> str | None:
+    if not isinstance(name, str):
+        return None
+    return font_files(fonts_dir).get(name.lower())
+
+
+@functools.lru_cache(maxsize=128)
+def load_font(path: str, size: int) -> ImageFont.FreeTypeFont:
+    return ImageFont.truetype(path, size)
+
+
+@functools.lru_cache(maxsize=32)
+def decode_image(src: str) -> Image.Image:
+    """Decoded RGBA layer image; callers must not modify the cached object."""
+    if src.startswith("data:"):
+        src = src.split(",", 1)[1]
+    src += "=" * (-len(src) % 4)
+    with Image.open(BytesIO(base64.b64decode(src))) as image:
+        return image.convert("RGBA")
+
+
+def needs_shaping(text: str) -> bool:
+    """Right-to-left text only lays out correctly with libraqm."""
+    return any(unicodedata.bidirectional(char) in ("R", "AL") for char in text)
+
+
+def has_src(layer: dict) -> bool:
+    src = layer.get("src")
+    return isinstance(src, str) and src not in ("", "None")
+
+
+def is_size(value) -> bool:
+    return isinstance(value, int) and 0 < value <= MAX_SIZE
+
+
+def is_known_layer(layer) -> bool:
+    """Whether `layer` only has the keys and values of its type above."""
+    if not isinstance(layer, dict) or layer.get("type") not in LAYER_KEYS:
+        return False
+    if not layer.keys() <= LAYER_KEYS[layer["type"]]:
+        return False
+    if any(not isinstance(layer.get(key, 0), int) for key in GEOMETRY_KEYS):
+        return False
+    return all(
+        layer[key] in choices for key, choices in CHOICES.items() if key in layer
+    )
+
+
+def supports(mwj, fonts_dir: str) -> bool:
+    """Whether `mwj` only uses layers this compositor can draw faithfully."""
+    if not isinstance(mwj, dict) or not isinstance(mwj.get("layers"), list):
+        return False
+    if not mwj.keys() <= CANVAS_KEYS:
+        return False
+    if not is_size(mwj.get("width")) or not is_size(mwj.get("height")):
+        return False
+
+    for layer in mwj["layers"]:
+        if not is_known_layer(layer):
+            return False
+        if layer["type"] == "color" and "color" not in layer:
+            return False
+        if layer["type"] in ("image", "logo") and has_src(layer):
+            # remote images would need a network fetch in the worker
+            if layer["src"].startswith(("http://", "https://")):
+                return False
+        if layer["type"] == "text":
+            if find_font(fonts_dir, layer.get("font")) is None:
+                return False
+            text = str(layer.get("text", ""))
+            if needs_shaping(text) and not features.check("raqm"):
+                return False
+    return True
+
+
+def layer_box(layer: dict, canvas: Image.Image) -> tuple[int, int, int, int]:
+    x, y = int(layer.get("x", 0)), int(layer.get("y", 0))
+    width = int(layer.get("width", canvas.width - x))
+    height = int(layer.get("height", canvas.height - y))
+    return x, y, max(1, width), max(1, height)
+
+
+def draw_color(canvas: Image.Image, layer: dict):
+    x, y, width, height = layer_box(layer, canvas)
+    fill = Image.new(
+        "RGBA", (width, height), ImageColor.getcolor(layer["color"], "RGBA")
+    )
+    canvas.paste(fill, (x, y), fill)
+
+
+def draw_image(canvas: Image.Image, layer: dict):
+    if not has_src(layer):
+        return
+    x, y, width, height = layer_box(layer, canvas)
+    image = decode_image(layer["src"])
+    fit = layer.get("fit", "contain")
+    if fit == "cover":
+        image = ImageOps.fit(image, (width, height), Image.Resampling.LANCZOS)
+    elif fit == "fill":
+        image = image.resize((width, height), Image.Resampling.LANCZOS)
+    else:
+        image = ImageOps.contain(image, (width, height), Image.Resampling.LANCZOS)
+        x += (width - image.width) // 2
+        y += (height - image.height) // 2
+    canvas.paste(image, (x, y), image)
+
+
+def wrap_text(
+    draw: ImageDraw.ImageDraw, text: str, font: ImageFont.FreeTypeFont, width: int
+) -> list[str]:
+    lines = []
+    for paragraph in text.split("\n"):
+        line = ""
+        for word in paragraph.split():
+            candidate = f"{line} {word}" if line else word
+            if line and draw.textlength(candidate, font=font) > width:
+                lines.append(line)
+                line = word
+            else:
+                line = candidate
+        lines.append(line)
+    return lines
+
+
+def draw_text(canvas: Image.Image, layer: dict, fonts_dir: str):
+    text = str(layer.get("text", ""))
+    if not text or text == "None":
+        return
+    x, y, width, _ = layer_box(layer, canvas)
+    font = load_font(find_font(fonts_dir, layer["font"]), int(layer.get("size", 32)))
+    fill = ImageColor.getcolor(layer.get("color", "#000000"), "RGBA")
+    align = layer.get("align", "left")
+    draw = ImageDraw.Draw(canvas)
+    line_height = sum(font.getmetrics())
+    for i, line in enumerate(wrap_text(draw, text, font, width)):
+        offset = 0
+        if align in ("center", "right"):
+            free = width - draw.textlength(line, font=font)
+            offset = free / 2 if align == "center" else free
+        draw.text((x + offset, y + i * line_height), line, font=font, fill=fill)
+
+
+def composite(mwj: dict, fonts_dir: str) -> bytes:
+    """Draw `mwj` and return it as a PNG."""
+    canvas = Image.new(
+        "RGBA",
+        (mwj["width"], mwj["height"]),
+        ImageColor.getcolor(mwj.get("background", "#ffffff"), "RGBA"),
+    )
+    for layer in mwj["layers"]:
+        if layer["type"] == "color":
+            draw_color(canvas, layer)
+        elif layer["type"] == "text":
+            draw_text(canvas, layer, fonts_dir)
+        else:
+            draw_image(canvas, layer)
+
+    buffer = BytesIO()
+    canvas.save(buffer, format="PNG", compress_level=1)
+    return buffer.getvalue()
@@ -0,0 +1,66 @@
+import asyncio
+import json
+import logging
+import random
+from pathlib import Path
+
+from server.config import Settings
+from server.executor import cpu_executor
+
+
+class DebugCapture:
+    """Opt-in, sampled capture of renderer payloads to `directory/<name>.json`.
+
+    Writes run in the background on the executor's thread pool. Payloads over
+    `max_bytes` are skipped and only the newest `max_files` files are kept.
+    """
+
+    def __init__(
+        self,
+        directory: Path,
+        sample_rate: float = 0,
+        max_bytes: int = 5 * 2**20,
+        max_files: int = 100,
+    ):
+        self.directory = directory
+        self.sample_rate = sample_rate
+        self.max_bytes = max_bytes
+        self.max_files = max_files
+        self._tasks: set[asyncio.Task] = set()
+
+    def sampled(self) -> bool:
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def _write(self, name: str, data: dict | list):
+        text = json.dumps(data, indent=4, ensure_ascii=False)
+        if len(text) > self.max_bytes:
+            logging.info(f"Skipped debug capture {name}: {len(text)} bytes")
+            return
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        (self.directory / f"{name}.json").write_text(text)
+
+        files = sorted(self.directory.glob("*.json"), key=lambda p: p.stat().st_mtime)
+        for path in files[: max(0, len(files) - self.max_files)]:
+            path.unlink(missing_ok=True)
+
+    async def _capture(self, name: str, data: dict | list):
+        try:
+            await cpu_executor.run_thread(self._write, name, data)
+        except Exception as e:
+            logging.warning(f"Debug capture {name} failed: {e}")
+
+    def capture(self, name: str, data: dict | list):
+        if not self.sampled():
+            return
+        task = asyncio.create_task(self._capture(name, data))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+
+debug_capture = DebugCapture(
+    directory=Path(Settings.MWJ_CAPTURE_DIR),
+    sample_rate=Settings.MWJ_CAPTURE_RATE,
+    max_bytes=Settings.MWJ_CAPTURE_MAX_BYTES,
+    max_files=Settings.MWJ_CAPTURE_MAX_FILES,
+)
@@ -0,0 +1,145 @@
+import asyncio
+import logging
+import uuid
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+from server.config import Settings
+
+from .models import Render, RenderGroup
+from .schemas import RenderEvent, RenderStage, RenderStatus
+
+
+class MemorySubscription:
+    def __init__(self):
+        self.queue: asyncio.Queue[str] = asyncio.Queue()
+
+    async def get(self, timeout: float) -> str | None:
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class MemoryEventBroker:
+    def __init__(self):
+        self._subscribers: dict[str, set[MemorySubscription]] = defaultdict(set)
+
+    async def publish(self, channel: str, message: str):
+        for subscription in self._subscribers.get(channel, ()):
+            subscription.queue.put_nowait(message)
+
+    @asynccontextmanager
+    async def subscribe(self, channel: str) -> AsyncIterator[MemorySubscription]:
+        subscription = MemorySubscription()
+        self._subscribers[channel].add(subscription)
+        try:
+            yield subscription
+        finally:
+            self._subscribers[channel].discard(subscription)
+            if not self._subscribers[channel]:
+                del self._subscribers[channel]
+
+
+class RedisSubscription:
+    def __init__(self, pubsub):
+        self.pubsub = pubsub
+
+    async def get(self, timeout: float) -> str | None:
+        message = await self.pubsub.get_message(
+            ignore_subscribe_messages=True, timeout=timeout
+        )
+        return message["data"] if message else None
+
+
+class RedisEventBroker:
+    def __init__(self, redis_uri: str):
+        from redis.asyncio import Redis
+
+        self._redis = Redis.from_url(redis_uri)
+
+    async def publish(self, channel: str, message: str):
+        await self._redis.publish(channel, message)
+
+    @asynccontextmanager
+    async def subscribe(self, channel: str) -> AsyncIterator[RedisSubscription]:
+        pubsub = self._redis.pubsub()
+        await pubsub.subscribe(channel)
+        try:
+            yield RedisSubscription(pubsub)
+        finally:
+            await pubsub.unsubscribe(channel)
+            await pubsub.aclose()
+
+
+def create_broker() -> MemoryEventBroker | RedisEventBroker:
+    if Settings.RENDER_EVENTS_BACKEND == "redis":
+        return RedisEventBroker(Settings.redis_uri)
+    return MemoryEventBroker()
+
+
+broker = create_broker()
+
+
+def channel(uid: uuid.UUID) -> str:
+    return f"render_events:{uid}"
+
+
+async def publish(uid: uuid.UUID, stage: RenderStage, **kwargs):
+    """Publish a progress event; failures are logged, never raised."""
+    event = RenderEvent(uid=uid, stage=stage, **kwargs)
+    try:
+        await broker.publish(channel(uid), event.model_dump_json())
+    except Exception as e:
+        logging.warning(f"Could not publish {stage.value} event for {uid}: {e}")
+
+
+def snapshot(item: Render | RenderGroup) -> RenderEvent:
+    return RenderEvent(
+        uid=item.uid,
+        stage=RenderStage(item.status.value),
+        results=item.results if item.status == RenderStatus.completed else [],
+        error=item.error,
+    )
+
+
+async def settle_legacy(item: Render | RenderGroup):
+    """Give a finished status to items stored before they had one.
+
+    Those load as pending but never publish an event, so they are completed
+    when they have results and failed otherwise.
+    """
+    if item.status != RenderStatus.pending or item.id is None:
+        return
+    legacy = (
+        await type(item).find({"_id": item.id, "status": {"$exists": False}}).count()
+    )
+    if not legacy:
+        return
+    if item.results:
+        item.status = RenderStatus.completed
+    else:
+        item.status = RenderStatus.error
+        item.error = item.error or "Render did not complete"
+
+
+async def stream_events(item: Render | RenderGroup) -> AsyncIterator[dict | None]:
+    """Yield the item's current state, then its events until it finishes.
+
+    `None` is yielded every `RENDER_EVENTS_KEEPALIVE` seconds without events.
+    """
+    async with broker.subscribe(channel(item.uid)) as subscription:
+        # re-read after subscribing so no event falls between the two
+        item = await type(item).find_one({"uid": item.uid}) or item
+        await settle_legacy(item)
+        event = snapshot(item)
+        yield event.model_dump(mode="json")
+
+        while not event.is_final:
+            message = await subscription.get(Settings.RENDER_EVENTS_KEEPALIVE)
+            if message is None:
+                yield None
+                continue
+            event = RenderEvent.model_validate_json(message)
+            yield event.model_dump(mode="json")
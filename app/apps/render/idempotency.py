@@ -0,0 +1,141 @@
+"""Deduplication of render creation requests.
+
+A request is keyed by its `Idempotency-Key` header or, without one, by a hash
+of its payload within a `RENDER_IDEMPOTENCY_WINDOW` seconds bucket. Identical
+requests in one worker share a single in-flight task; across workers the
+unique (user_id, idempotency_key) index lets only one of them create the
+render, and the others return or wait for it.
+"""
+
+import asyncio
+import hashlib
+import json
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, TypeVar
+
+import fastapi
+from fastapi_mongo_base.core.exceptions import BaseHTTPException
+from pymongo.errors import DuplicateKeyError
+from server.config import Settings
+
+from . import events
+from .models import Render, RenderGroup
+from .schemas import RenderStatus
+
+T = TypeVar("T", Render, RenderGroup)
+
+FINAL_STATUSES = (RenderStatus.completed, RenderStatus.error)
+# seconds between status re-reads while waiting on another worker's render
+POLL_INTERVAL = 2
+
+_inflight: dict[tuple, asyncio.Task] = {}
+
+
+@dataclass(frozen=True)
+class RequestKey:
+    value: str
+    request_hash: str
+    explicit: bool
+
+
+def hash_request(data: dict) -> str:
+    text = json.dumps(data, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def request_key(request: fastapi.Request, data: dict) -> RequestKey | None:
+    request_hash = hash_request(data)
+    header = request.headers.get("Idempotency-Key")
+    if header:
+        return RequestKey(f"key:{header}", request_hash, explicit=True)
+    # asking to bypass the cache also opts out of automatic deduplication
+    if Settings.RENDER_IDEMPOTENCY_WINDOW <= 0 or not data.get("use_cache", True):
+        return None
+    bucket = int(time.time() // Settings.RENDER_IDEMPOTENCY_WINDOW)
+    return RequestKey(f"auto:{request_hash}:{bucket}", request_hash, explicit=False)
+
+
+async def single_flight(key: tuple, func: Callable[[], Awaitable[T]]) -> T:
+    """Await `func()`, sharing one call between concurrent callers of `key`.
+
+    The call is shielded, so it finishes even if the caller that started it
+    goes away.
+    """
+    task = _inflight.get(key)
+    if task is None:
+        task = asyncio.ensure_future(func())
+        _inflight[key] = task
+        task.add_done_callback(lambda _: _inflight.pop(key, None))
+    return await asyncio.shield(task)
+
+
+def is_reusable(item: Render | RenderGroup, key: RequestKey) -> bool:
+    if key.explicit:
+        expires = item.created_at + timedelta(seconds=Settings.RENDER_IDEMPOTENCY_TTL)
+        return datetime.now() < expires
+    # an automatic key should not pin a failure on the retries it dedupes
+    return item.status != RenderStatus.error
+
+
+async def create_once(item: T, key: RequestKey) -> tuple[T, bool]:
+    """Insert `item` under `key`, or return the item that already holds it.
+
+    Returns the item and whether it was created by this call.
+    """
+    model = type(item)
+    item.idempotency_key = key.value
+    item.request_hash = key.request_hash
+    for _ in range(3):
+        try:
+            await item.insert()
+            return item, True
+        except DuplicateKeyError:
+            existing = await model.find_one(
+                {"user_id": item.user_id, "idempotency_key": key.value}
+            )
+        if existing is None:
+            continue
+        if existing.request_hash != key.request_hash:
+            raise BaseHTTPException(
+                status_code=422,
+                error="idempotency_key_reused",
+                message="Idempotency-Key was already used for a different request",
+            )
+        if is_reusable(existing, key):
+            return existing, False
+        # release the stale key so this request can take it over
+        await model.find_one({"_id": existing.id}).update(
+            {"$unset": {"idempotency_key": ""}}
+        )
+
+    raise BaseHTTPException(
+        status_code=409,
+        error="idempotency_conflict",
+        message="Could not claim the Idempotency-Key, please retry",
+    )
+
+
+async def wait_finished(item: T, timeout: float) -> T:
+    """Wait until a render started elsewhere finishes, up to `timeout` seconds.
+
+    Progress events wake the wait early; the status is also re-read every
+    `POLL_INTERVAL` seconds as events may not reach this worker.
+    """
+    model = type(item)
+    deadline = time.monotonic() + timeout
+    async with events.broker.subscribe(events.channel(item.uid)) as subscription:
+        while True:
+            item = await model.find_one({"uid": item.uid}) or item
+            remaining = deadline - time.monotonic()
+            if item.status in FINAL_STATUSES or remaining <= 0:
+                return item
+            await subscription.get(min(POLL_INTERVAL, remaining))
+
+
+def inflight_key(model: type, user_id: uuid.UUID, key: RequestKey) -> tuple:
+    # a reused key with another payload must not join the first request; it
+    # runs on its own and gets the 422 from `create_once`
+    return model.__name__, user_id, key.value, key.request_hash
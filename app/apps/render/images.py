@@ -0,0 +1,80 @@
+import base64
+from dataclasses import dataclass
+from io import BytesIO
+
+from fastapi_mongo_base.utils import imagetools
+from PIL import Image, ImageOps
+
+EXTENSIONS = {
+    "JPEG": "jpg",
+    "PNG": "png",
+    "WEBP": "webp",
+    "AVIF": "avif",
+    "GIF": "gif",
+    "BMP": "bmp",
+}
+
+
+@dataclass
+class RenderedImage:
+    """Encoded renderer output; the pixels are only decoded when re-encoding."""
+
+    data: bytes
+    format: str
+    width: int
+    height: int
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "RenderedImage":
+        # Image.open only parses the header, the pixel data is never loaded here
+        with Image.open(BytesIO(data)) as image:
+            return cls(
+                data=data, format=image.format, width=image.width, height=image.height
+            )
+
+    @classmethod
+    def from_base64(cls, encoded: str) -> "RenderedImage":
+        if encoded.startswith("data:"):
+            encoded = encoded.split(",", 1)[1]
+        encoded += "=" * (-len(encoded) % 4)
+        return cls.from_bytes(base64.b64decode(encoded))
+
+    @property
+    def size(self) -> tuple[int, int]:
+        return self.width, self.height
+
+    def to_image(self) -> Image.Image:
+        return Image.open(BytesIO(self.data))
+
+    def target_size(
+        self, width: int | None = None, height: int | None = None
+    ) -> tuple[int, int]:
+        if width and height:
+            return width, height
+        if width:
+            return width, max(1, round(self.height * width / self.width))
+        if height:
+            return max(1, round(self.width * height / self.height)), height
+        return self.size
+
+    def derive(
+        self,
+        format: str = "JPEG",
+        quality: int | None = None,
+        width: int | None = None,
+        height: int | None = None,
+        fit: str = "cover",
+    ) -> "RenderedImage":
+        """Resize and encode in one call, so a derivative costs one executor job."""
+        size = self.target_size(width, height)
+        if size == self.size and format == self.format:
+            return self
+
+        image = self.to_image()
+        if size != self.size:
+            method = ImageOps.contain if fit == "contain" else ImageOps.fit
+            image = method(image, size, Image.Resampling.LANCZOS)
+        data = imagetools.convert_image_bytes(image, format, quality).getvalue()
+        return RenderedImage(
+            data=data, format=format, width=image.width, height=image.height
+        )
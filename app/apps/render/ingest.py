@@ -0,0 +1,151 @@
+"""Inline images moved out of render requests before they are stored.
+
+Data URLs in dict-form `images` and in `logo` are uploaded to ufiles once
+per user and content digest and replaced by their url, so render documents
+only keep references. The upload also primes the asset cache, which is how
+rendering resolves those fields back to image data.
+
+List-form `images` are bound to the template as sent, so their inline values
+(data URLs or bare base64) are kept: replacing them would hand the renderer
+a url instead of the image. They are still size-checked and rejected like
+the others.
+"""
+
+import asyncio
+import base64
+import binascii
+import hashlib
+import uuid
+
+from fastapi_mongo_base.core.exceptions import BaseHTTPException
+from server.cache import LRUCache
+from server.config import Settings
+from server.executor import cpu_executor
+
+from .assets import asset_cache
+from .images import RenderedImage
+from .services import upload_image
+
+# longer strings that are not urls are taken as bare base64 images
+INLINE_MIN_LENGTH = 512
+
+# (user_id, digest) -> ufiles url of images this worker already uploaded
+uploaded_images = LRUCache(4096)
+
+
+def is_inline(value: str) -> bool:
+    if value.startswith("data:"):
+        return True
+    return len(value) > INLINE_MIN_LENGTH and not value.startswith(
+        ("http://", "https://")
+    )
+
+
+def payload_size(value: str) -> int:
+    """Decoded size of an inline image, without decoding it."""
+    payload = value.split(",", 1)[-1] if value.startswith("data:") else value
+    return len(payload) * 3 // 4
+
+
+def read_inline_image(value: str) -> tuple[RenderedImage, str]:
+    payload = value.split(",", 1)[-1] if value.startswith("data:") else value
+    payload += "=" * (-len(payload) % 4)
+    try:
+        data = base64.b64decode(payload, validate=True)
+        image = RenderedImage.from_bytes(data)
+    except (binascii.Error, OSError):
+        raise ValueError("not a base64 encoded image")
+    return image, hashlib.sha256(data).hexdigest()
+
+
+def inline_values(value) -> set[str]:
+    if isinstance(value, str):
+        return {value} if is_inline(value) else set()
+    if isinstance(value, dict):
+        value = list(value.values())
+    if isinstance(value, list):
+        return set().union(*[inline_values(item) for item in value])
+    return set()
+
+
+def uploadable_values(value) -> set[str]:
+    """Inline values outside list-form images, which are rendered as sent."""
+    if isinstance(value, (str, dict)):
+        return inline_values(value)
+    if isinstance(value, list):
+        return set().union(
+            *[uploadable_values(item) for item in value if isinstance(item, dict)]
+        )
+    return set()
+
+
+def replace_values(value, urls: dict[str, str]):
+    if isinstance(value, str):
+        return urls.get(value, value)
+    if isinstance(value, dict):
+        return {key: replace_values(item, urls) for key, item in value.items()}
+    if isinstance(value, list):
+        return [
+            replace_values(item, urls) if isinstance(item, dict) else item
+            for item in value
+        ]
+    return value
+
+
+async def upload_inline_image(value: str, user_id: uuid.UUID) -> str:
+    try:
+        image, digest = await cpu_executor.run(read_inline_image, value)
+    except ValueError as e:
+        raise BaseHTTPException(
+            status_code=400, error="invalid_image", message=f"Inline image is {e}"
+        )
+
+    url = uploaded_images.get((user_id, digest))
+    if url is None:
+        ufile = await upload_image(
+            image, image_name=digest, user_id=user_id, file_upload_dir="inputs"
+        )
+        url = ufile.url
+        uploaded_images.set((user_id, digest), url)
+        await asset_cache.put(url, image.data)
+    return url
+
+
+async def ingest_images(data: dict, user_id: uuid.UUID) -> dict:
+    """Return `data` with inline images in `images` and `logo` replaced by
+    ufiles urls.
+
+    Every inline image is limited to RENDER_INLINE_IMAGE_MAX_BYTES; then,
+    depending on RENDER_INLINE_IMAGES, they are uploaded, rejected or kept.
+    """
+    inline = inline_values([data.get("images"), data.get("logo")])
+    if not inline:
+        return data
+
+    max_bytes = Settings.RENDER_INLINE_IMAGE_MAX_BYTES
+    if any(payload_size(value) > max_bytes for value in inline):
+        raise BaseHTTPException(
+            status_code=413,
+            error="image_too_large",
+            message=f"Inline images are limited to {max_bytes} bytes",
+        )
+    if Settings.RENDER_INLINE_IMAGES == "reject":
+        raise BaseHTTPException(
+            status_code=400,
+            error="inline_image_not_allowed",
+            message="Images must be urls, not inline data",
+        )
+    uploadable = list(
+        uploadable_values(data.get("images")) | uploadable_values(data.get("logo"))
+    )
+    if Settings.RENDER_INLINE_IMAGES == "keep" or not uploadable:
+        return data
+
+    urls = await asyncio.gather(
+        *[upload_inline_image(value, user_id) for value in uploadable]
+    )
+    return data | {
+        key: replace_values(data.get(key), dict(zip(uploadable, urls)))
+        for key in ("images", "logo")
+        if key in data
+    }
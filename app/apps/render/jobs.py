@@ -0,0 +1,208 @@
+import asyncio
+import logging
+import uuid
+from datetime import datetime, timedelta
+from typing import Literal
+
+from beanie import UpdateResponse
+from pydantic import BaseModel
+from server.config import Settings
+
+from .models import Render, RenderGroup
+from .schemas import RenderStatus
+from .services import run_render
+
+
+class RenderJob(BaseModel):
+    kind: Literal["render", "group"]
+    uid: uuid.UUID
+
+    @classmethod
+    def from_item(cls, item: Render | RenderGroup) -> "RenderJob":
+        return cls(
+            kind="group" if isinstance(item, RenderGroup) else "render", uid=item.uid
+        )
+
+    @property
+    def model(self) -> type[Render] | type[RenderGroup]:
+        return RenderGroup if self.kind == "group" else Render
+
+    async def claim(self) -> Render | RenderGroup | None:
+        """Atomically move a pending item to processing so it runs only once."""
+        return await self.model.find_one(
+            {"uid": self.uid, "status": RenderStatus.pending}
+        ).update(
+            {"$set": {"status": RenderStatus.processing, "updated_at": datetime.now()}},
+            response_type=UpdateResponse.NEW_DOCUMENT,
+        )
+
+    async def release(self):
+        """Move a claimed item back to pending after its run was interrupted."""
+        await self.model.find_one(
+            {"uid": self.uid, "status": RenderStatus.processing}
+        ).update(
+            {"$set": {"status": RenderStatus.pending, "updated_at": datetime.now()}}
+        )
+
+
+class MemoryJobQueue:
+    def __init__(self):
+        self._queue: asyncio.Queue[RenderJob] = asyncio.Queue()
+
+    async def put(self, job: RenderJob):
+        await self._queue.put(job)
+
+    async def get(self) -> RenderJob:
+        return await self._queue.get()
+
+
+class RedisJobQueue:
+    def __init__(self, redis_uri: str, name: str = "render_jobs"):
+        from redis.asyncio import Redis
+
+        self.name = name
+        self._redis = Redis.from_url(redis_uri)
+
+    async def put(self, job: RenderJob):
+        await self._redis.lpush(self.name, job.model_dump_json())
+
+    async def get(self) -> RenderJob:
+        _, raw = await self._redis.brpop(self.name)
+        return RenderJob.model_validate_json(raw)
+
+
+def create_queue() -> MemoryJobQueue | RedisJobQueue:
+    if Settings.RENDER_QUEUE_BACKEND == "redis":
+        return RedisJobQueue(Settings.redis_uri)
+    return MemoryJobQueue()
+
+
+queue = create_queue()
+
+
+async def enqueue(item: Render | RenderGroup):
+    await queue.put(RenderJob.from_item(item))
+
+
+async def process_job(job: RenderJob):
+    item = await job.claim()
+    if item is None:
+        # already taken, e.g. a job enqueued again by `requeue_stale`
+        logging.info(f"Render job {job.kind}:{job.uid} is not pending")
+        return
+
+    try:
+        await run_render(item)
+    except asyncio.CancelledError:
+        # stopped mid-run: hand the job back instead of leaving it processing
+        await job.release()
+        await queue.put(job)
+        raise
+    except Exception as e:
+        logging.error(f"Render job {job.kind}:{job.uid} failed: {e}")
+
+
+async def requeue_pending():
+    """Re-enqueue renders left pending, e.g. by a restart with an in-memory queue."""
+    for model in (Render, RenderGroup):
+        async for item in model.find({"status": RenderStatus.pending}):
+            await enqueue(item)
+
+
+async def requeue_stale(stale_after: float):
+    """Re-enqueue items pending or processing for over `stale_after` seconds.
+
+    These were lost by a worker that died mid-run or after taking the job off
+    the queue. Claiming is atomic, so a job enqueued twice still runs once.
+    """
+    cutoff = datetime.now() - timedelta(seconds=stale_after)
+    statuses = [RenderStatus.pending, RenderStatus.processing]
+    for model in (Render, RenderGroup):
+        query = {"status": {"$in": statuses}, "updated_at": {"$lt": cutoff}}
+        async for item in model.find(query):
+            # guarded on updated_at so an item that moved on is left alone
+            item = await model.find_one(
+                {"_id": item.id, "updated_at": item.updated_at}
+            ).update(
+                {
+                    "$set": {
+                        "status": RenderStatus.pending,
+                        "updated_at": datetime.now(),
+                    }
+                },
+                response_type=UpdateResponse.NEW_DOCUMENT,
+            )
+            if item is not None:
+                logging.warning(f"Requeueing stale render {item.uid}")
+                await enqueue(item)
+
+
+class RenderWorkerPool:
+    """`size` workers taking jobs off the queue.
+
+    Stopping lets running jobs finish for up to `drain_timeout` seconds, then
+    cancels them, which puts them back on the queue. Every `stale_after / 2`
+    seconds jobs lost by dead workers are re-enqueued.
+    """
+
+    def __init__(
+        self,
+        size: int = Settings.RENDER_WORKERS,
+        drain_timeout: float = Settings.RENDER_DRAIN_TIMEOUT,
+        stale_after: float = Settings.RENDER_JOB_STALE_AFTER,
+    ):
+        self.size = size
+        self.drain_timeout = drain_timeout
+        self.stale_after = stale_after
+        self._tasks: list[asyncio.Task] = []
+        self._busy: set[asyncio.Task] = set()
+        self._sweeper: asyncio.Task | None = None
+        self._stopping = False
+
+    async def _work(self):
+        task = asyncio.current_task()
+        while not self._stopping:
+            job = await queue.get()
+            self._busy.add(task)
+            try:
+                await process_job(job)
+            finally:
+                self._busy.discard(task)
+
+    async def _sweep(self):
+        while True:
+            try:
+                await requeue_stale(self.stale_after)
+            except Exception as e:
+                logging.warning(f"Requeueing stale renders failed: {e}")
+            await asyncio.sleep(self.stale_after / 2)
+
+    def start(self):
+        self._stopping = False
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.size)]
+        if self.stale_after > 0:
+            self._sweeper = asyncio.create_task(self._sweep())
+
+    async def stop(self):
+        self._stopping = True
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+        for task in self._tasks:
+            if task not in self._busy:
+                task.cancel()
+
+        running = [task for task in self._tasks if not task.done()]
+        if running:
+            _, unfinished = await asyncio.wait(running, timeout=self.drain_timeout)
+            if unfinished:
+                logging.warning(f"Requeueing {len(unfinished)} unfinished render jobs")
+            for task in unfinished:
+                task.cancel()
+        await asyncio.gather(
+            *self._tasks, *filter(None, [self._sweeper]), return_exceptions=True
+        )
+        self._tasks = []
+        self._sweeper = None
+
+
+workers = RenderWorkerPool()
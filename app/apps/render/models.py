@@ -1,17 +1,45 @@
 import uuid
 
 from fastapi_mongo_base.models import OwnedEntity
+from pymongo import ASCENDING, DESCENDING, IndexModel
 
 from .schemas import RenderGroupSchema, RenderSchema
 
+# at most one render per user and Idempotency-Key (or automatic request key)
+IDEMPOTENCY_INDEX = IndexModel(
+    [("user_id", ASCENDING), ("idempotency_key", ASCENDING)],
+    unique=True,
+    partialFilterExpression={"idempotency_key": {"$type": "string"}},
+)
+
+
+# a user's history, newest first, as the list routes page through it
+HISTORY_INDEX = IndexModel(
+    [
+        ("user_id", ASCENDING),
+        ("is_deleted", ASCENDING),
+        ("created_at", DESCENDING),
+        ("_id", DESCENDING),
+    ]
+)
+
 
 class Render(RenderSchema, OwnedEntity):
+    idempotency_key: str | None = None
+    request_hash: str | None = None
+
     class Settings:
-        indexes = OwnedEntity.Settings.indexes
+        indexes = OwnedEntity.Settings.indexes + [
+            IndexModel([("mwj_hash", ASCENDING), ("created_at", DESCENDING)]),
+            IDEMPOTENCY_INDEX,
+            HISTORY_INDEX,
+        ]
 
 
 class RenderGroup(RenderGroupSchema, OwnedEntity):
     render_ids: list[uuid.UUID] = []
+    idempotency_key: str | None = None
+    request_hash: str | None = None
 
     class Settings:
-        indexes = OwnedEntity.Settings.indexes
+        indexes = OwnedEntity.Settings.indexes + [IDEMPOTENCY_INDEX, HISTORY_INDEX]
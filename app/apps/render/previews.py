@@ -0,0 +1,122 @@
+"""Gallery previews rendered once per template from its field defaults."""
+
+import asyncio
+import logging
+
+from apps.template.cache import template_documents
+from apps.template.models import Template
+from apps.template.schemas import TemplatePreview
+from server.config import Settings
+from server.executor import cpu_executor
+
+from .schemas import RenderOutput
+from .services import (
+    derive_image,
+    download_images,
+    fill_render_template_data,
+    get_rendering_template,
+    hash_mwj,
+    render_mwj,
+    upload_image,
+)
+
+# one pending preview task per template name, newer edits replace older ones
+_tasks: dict[str, asyncio.Task] = {}
+
+
+def preview_sizes() -> list[int]:
+    return [int(size) for size in Settings.TEMPLATE_PREVIEW_SIZES.split(",") if size]
+
+
+async def preview_mwj(template_name: str) -> dict:
+    _, plan, jinja_template = await get_rendering_template(template_name)
+    defaults = {slot.name: slot.default for slot in plan.images if slot.default}
+    data = (
+        plan.bind_texts([])
+        | plan.bind_fonts([])
+        | plan.bind_colors([])
+        | await download_images(defaults, plan)
+        | {"logo": None}
+    )
+    return await fill_render_template_data(jinja_template, data, template_name)
+
+
+async def render_previews(template_name: str) -> list[TemplatePreview] | None:
+    """Render `template_name` with its defaults and upload every preview size.
+
+    Returns None when the previews are already up to date.
+    """
+    template = await Template.find_one({"name": template_name})
+    if template is None:
+        return None
+
+    mwj = await preview_mwj(template_name)
+    mwj_hash = await cpu_executor.run(hash_mwj, mwj)
+    if template.previews and template.preview_hash == mwj_hash:
+        return None
+
+    image = await render_mwj(
+        mwj, name=f"preview_{template_name}", template_name=template_name
+    )
+
+    async def upload_preview(width: int) -> TemplatePreview:
+        output = RenderOutput(
+            width=width,
+            format=Settings.TEMPLATE_PREVIEW_FORMAT,
+            quality=Settings.TEMPLATE_PREVIEW_QUALITY,
+        )
+        preview = await derive_image(image, output, template_name)
+        ufile = await upload_image(
+            preview,
+            image_name=f"{template.uid}_{width}",
+            user_id=template.creator_id,
+            file_upload_dir="previews",
+            template_name=template_name,
+        )
+        return TemplatePreview(
+            url=ufile.url, width=preview.width, height=preview.height
+        )
+
+    # previews are never upscaled past the rendered size
+    widths = sorted({min(width, image.width) for width in preview_sizes()})
+    previews = await asyncio.gather(*[upload_preview(width) for width in widths])
+    await Template.find_one({"_id": template.id}).update(
+        {
+            "$set": {
+                "previews": [preview.model_dump() for preview in previews],
+                "preview_hash": mwj_hash,
+            }
+        }
+    )
+    template_documents.invalidate_id(template.id)
+    template_documents.invalidate(template_name)
+    return previews
+
+
+async def _render_previews(template_name: str):
+    try:
+        previews = await render_previews(template_name)
+    except Exception as e:
+        logging.warning(f"Previews of template {template_name} failed: {e}")
+        return
+    if previews is not None:
+        logging.info(f"Rendered {len(previews)} previews of {template_name}")
+
+
+def schedule_previews(template_name: str):
+    """Render previews in the background; a newer call for the same template
+    cancels one still in flight."""
+    if not Settings.TEMPLATE_PREVIEWS:
+        return
+    pending = _tasks.pop(template_name, None)
+    if pending is not None:
+        pending.cancel()
+
+    task = asyncio.create_task(_render_previews(template_name))
+    _tasks[template_name] = task
+
+    def done(task: asyncio.Task):
+        if _tasks.get(template_name) is task:
+            del _tasks[template_name]
+
+    task.add_done_callback(done)
@@ -1,18 +1,141 @@
+import uuid
+from datetime import datetime
+from typing import TypeVar
+
 import fastapi
+from fastapi.responses import StreamingResponse
 from fastapi_mongo_base.routes import AbstractBaseRouter
+from server import listing
+from server.config import Settings
+from server.streaming import stream_response
 from usso.fastapi import jwt_access_security
 
+from . import events, idempotency, jobs
+from .ingest import ingest_images
 from .models import Render, RenderGroup
 from .schemas import (
     RenderCreateSchema,
     RenderGroupCreateSchema,
     RenderGroupSchema,
     RenderSchema,
+    RenderStatus,
+    RenderVariantsCreateSchema,
 )
-from .services import process_render, process_render_bulk
+from .services import run_render
+from .variants import prepare_variants, render_variants
+
+T = TypeVar("T", Render, RenderGroup)
+TS = TypeVar("TS", RenderSchema, RenderGroupSchema)
+
+
+class AbstractRenderRouter(AbstractBaseRouter[T, TS]):
+    def config_routes(self, **kwargs):
+        kwargs["list_route"] = False
+        super().config_routes(**kwargs)
+        listing.add_list_route(self)
+
+        self.router.add_api_route(
+            "/{uid:uuid}/events",
+            self.stream_events,
+            methods=["GET"],
+            response_class=StreamingResponse,
+        )
+
+    async def list_items(
+        self,
+        request: fastapi.Request,
+        offset: int = fastapi.Query(0, ge=0),
+        limit: int = fastapi.Query(10, ge=1, le=Settings.page_max_limit),
+        created_at_from: datetime | None = None,
+        created_at_to: datetime | None = None,
+        fields: str | None = None,
+        cursor: str | None = None,
+    ):
+        """List newest first; `fields` projects and `cursor` continues a page."""
+        user_id = await self.get_user_id(request)
+        return await listing.list_page(
+            self.model,
+            self.list_item_schema,
+            self.model.get_queryset(
+                user_id=user_id,
+                created_at_from=created_at_from,
+                created_at_to=created_at_to,
+            ),
+            offset=offset,
+            limit=limit,
+            cursor=cursor,
+            fields=listing.parse_fields(fields, self.list_item_schema),
+        )
+
+    async def stream_events(self, request: fastapi.Request, uid: uuid.UUID):
+        """Stream progress as server-sent events (or NDJSON) until finished.
+
+        The first event is the current state; groups also report each
+        template as it completes.
+        """
+        user_id = await self.get_user_id(request)
+        item = await self.get_item(uid, user_id=user_id)
+        return stream_response(request, events.stream_events(item), event="progress")
+
+    async def create_render(
+        self,
+        request: fastapi.Request,
+        response: fastapi.Response,
+        data: dict,
+        background: bool = False,
+    ) -> T:
+        queued = background or Settings.RENDER_JOB_MODE
+        if queued:
+            response.status_code = 202
 
+        # keyed on the request as sent, inline images are uploaded after
+        key = idempotency.request_key(request, data)
+        user_id = await self.get_user_id(request)
+        if key is None:
+            data = await ingest_images(data, user_id)
+            # built here, as the base create_item re-reads the raw request body
+            # and would store the inline images again
+            status = RenderStatus.pending if queued else RenderStatus.processing
+            item = await self.model(**data, user_id=user_id, status=status).insert()
+            if queued:
+                await jobs.enqueue(item)
+                return item
+            return await run_render(item)
 
-class RenderRouter(AbstractBaseRouter[Render, RenderSchema]):
+        return await idempotency.single_flight(
+            idempotency.inflight_key(self.model, user_id, key),
+            lambda: self.create_render_once(data, user_id, key, queued),
+        )
+
+    async def create_render_once(
+        self,
+        data: dict,
+        user_id: uuid.UUID,
+        key: idempotency.RequestKey,
+        queued: bool,
+    ) -> T:
+        """Create and run the render for `key`, unless a request with the same
+        key already did; then return that render, once finished if not queued.
+        """
+        data = await ingest_images(data, user_id)
+        status = RenderStatus.pending if queued else RenderStatus.processing
+        item, created = await idempotency.create_once(
+            self.model(**data, user_id=user_id, status=status), key
+        )
+        if not created:
+            if queued:
+                return item
+            return await idempotency.wait_finished(
+                item, Settings.RENDER_IDEMPOTENCY_WAIT
+            )
+
+        if queued:
+            await jobs.enqueue(item)
+            return item
+        return await run_render(item)
+
+
+class RenderRouter(AbstractRenderRouter[Render, RenderSchema]):
     def __init__(self):
         super().__init__(
             model=Render,
@@ -26,17 +149,50 @@ class RenderRouter(AbstractBaseRouter[Render, RenderSchema]):
         kwargs["update_route"] = False
         super().config_routes(**kwargs)
 
+        self.router.add_api_route(
+            "/variants",
+            self.create_variants,
+            methods=["POST"],
+            response_class=StreamingResponse,
+        )
+
     async def create_item(
         self,
         request: fastapi.Request,
+        response: fastapi.Response,
         data: RenderCreateSchema,
+        background: bool = False,
     ):
-        render = await super().create_item(request, data.model_dump())
-        await process_render(render)
-        return render
+        return await self.create_render(
+            request, response, data.model_dump(), background
+        )
+
+    async def create_variants(
+        self, request: fastapi.Request, data: RenderVariantsCreateSchema
+    ):
+        """Render every texts x fonts x images x colors combination.
+
+        Results stream back as NDJSON, or as server-sent events when the
+        request accepts `text/event-stream`, in the order they complete.
+        """
+        user_id = await self.get_user_id(request)
+        data = data.model_copy(
+            update=await ingest_images(
+                data.model_dump(include={"images", "logo"}), user_id
+            )
+        )
+        variants = await prepare_variants(data, user_id)
+
+        async def results():
+            async for variant in render_variants(variants):
+                yield self.schema(**variant.render.model_dump()).model_dump(
+                    mode="json"
+                ) | {"variant": variant.index}
 
+        return stream_response(request, results(), event="render")
 
-class RenderGroupRouter(AbstractBaseRouter[RenderGroup, RenderGroupSchema]):
+
+class RenderGroupRouter(AbstractRenderRouter[RenderGroup, RenderGroupSchema]):
     def __init__(self):
         super().__init__(
             model=RenderGroup,
@@ -53,11 +209,13 @@ class RenderGroupRouter(AbstractBaseRouter[RenderGroup, RenderGroupSchema]):
     async def create_item(
         self,
         request: fastapi.Request,
+        response: fastapi.Response,
         data: RenderGroupCreateSchema,
+        background: bool = False,
     ):
-        render_group = await super().create_item(request, data.model_dump())
-        await process_render_bulk(render_group)
-        return render_group
+        return await self.create_render(
+            request, response, data.model_dump(), background
+        )
 
 
 router = RenderRouter().router
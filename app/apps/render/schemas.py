@@ -1,5 +1,62 @@
+import uuid
+from enum import Enum
+
 from fastapi_mongo_base.schemas import OwnedEntitySchema
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, model_validator
+from server.config import Settings
+
+
+class RenderStatus(str, Enum):
+    pending = "pending"
+    processing = "processing"
+    completed = "completed"
+    error = "error"
+
+
+class RenderStage(str, Enum):
+    pending = "pending"
+    processing = "processing"
+    assets_fetched = "assets_fetched"
+    mwj_filled = "mwj_filled"
+    rendered = "rendered"
+    uploaded = "uploaded"
+    template_completed = "template_completed"
+    template_error = "template_error"
+    completed = "completed"
+    error = "error"
+
+
+class OutputFormat(str, Enum):
+    JPEG = "JPEG"
+    PNG = "PNG"
+    WEBP = "WEBP"
+    AVIF = "AVIF"
+
+    @classmethod
+    def _missing_(cls, value):
+        if isinstance(value, str):
+            return cls.__members__.get(value.upper())
+
+
+class OutputFit(str, Enum):
+    cover = "cover"
+    contain = "contain"
+
+
+class RenderOutput(BaseModel):
+    """A size and encoding derived from the rendered image.
+
+    With only one side set the aspect ratio is kept; with both, `cover` crops
+    to fill the box and `contain` fits inside it. `format` and `quality`
+    default to RENDER_OUTPUT_FORMAT and RENDER_OUTPUT_QUALITY, and renderer
+    output that needs no resize or format change is uploaded as it is.
+    """
+
+    width: int | None = Field(None, gt=0, le=Settings.RENDER_OUTPUT_MAX_SIZE)
+    height: int | None = Field(None, gt=0, le=Settings.RENDER_OUTPUT_MAX_SIZE)
+    fit: OutputFit = OutputFit.cover
+    format: OutputFormat | None = None
+    quality: int | None = Field(None, ge=1, le=100)
 
 
 class RenderCreateSchema(BaseModel):
@@ -10,16 +67,37 @@ class RenderCreateSchema(BaseModel):
     logo: str | None = None
     colors: list[str] = []
     meta_data: dict | None = None
+    use_cache: bool = True
+    outputs: list[RenderOutput] = Field([], max_length=Settings.RENDER_OUTPUTS_MAX)
 
 
 class RenderResult(BaseModel):
     url: str
     width: int
     height: int
+    template_name: str | None = None
+    format: str | None = None
 
 
 class RenderSchema(RenderCreateSchema, OwnedEntitySchema):
     results: list[RenderResult] = []
+    status: RenderStatus = RenderStatus.pending
+    error: str | None = None
+    mwj_hash: str | None = None
+
+
+class RenderEvent(BaseModel):
+    """A progress update for a render or render group, keyed by its uid."""
+
+    uid: uuid.UUID
+    stage: RenderStage
+    template_name: str | None = None
+    results: list[RenderResult] = []
+    error: str | None = None
+
+    @property
+    def is_final(self) -> bool:
+        return self.stage in (RenderStage.completed, RenderStage.error)
 
 
 class RenderGroupCreateSchema(BaseModel):
@@ -30,7 +108,37 @@ class RenderGroupCreateSchema(BaseModel):
     logo: str | None = None
     colors: list[str] = []
     meta_data: dict | None = None
+    use_cache: bool = True
+    outputs: list[RenderOutput] = Field([], max_length=Settings.RENDER_OUTPUTS_MAX)
 
 
 class RenderGroupSchema(RenderGroupCreateSchema, OwnedEntitySchema):
     results: list[RenderResult] = []
+    status: RenderStatus = RenderStatus.pending
+    error: str | None = None
+    errors: dict[str, str] = {}
+
+
+class RenderVariantsCreateSchema(BaseModel):
+    """A template (or group) rendered for every combination of the variants."""
+
+    template_name: str | None = None
+    group_name: str | None = None
+    texts: list[dict[str, str] | list[str]] = [{}]
+    fonts: list[list[str] | str] = [["Vazirmatn"]]
+    images: list[dict[str, str] | list[str]] = [{}]
+    logo: str | None = None
+    colors: list[list[str]] = [[]]
+    meta_data: dict | None = None
+    use_cache: bool = True
+    outputs: list[RenderOutput] = Field([], max_length=Settings.RENDER_OUTPUTS_MAX)
+
+    @model_validator(mode="after")
+    def validate_target(self):
+        if (self.template_name is None) == (self.group_name is None):
+            raise ValueError("Exactly one of template_name or group_name is required")
+        return self
+
+    @property
+    def size(self) -> int:
+        return len(self.texts) * len(self.fonts) * len(self.images) * len(self.colors)
@@ -1,247 +1,609 @@
+import abc
 import asyncio
+import hashlib
 import json
+import logging
+import time
 import uuid
+from dataclasses import dataclass
+from datetime import datetime, timedelta
 
 import httpx
 import jinja2
 import ufiles
+from apps.template.bindings import BindingPlan, get_binding_plan
+from apps.template.cache import compiled_templates
 from apps.template.models import Template, TemplateGroup
-from apps.template.schemas import FieldType
-from fastapi_mongo_base.utils import basic, imagetools, texttools
-from PIL import Image
+from fastapi_mongo_base.core.exceptions import BaseHTTPException
+from server.clients import clients
 from server.config import Settings
-
+from server.executor import CPUExecutor, cpu_executor
+from server.metrics import timed
+from server.renderers import renderers
+from server.resilience import upstreams
+
+from . import compositor, events
+from .assets import asset_cache, encode_data_url
+from .debug import debug_capture
+from .images import EXTENSIONS, RenderedImage
 from .models import Render, RenderGroup
-from .schemas import RenderResult
+from .schemas import (
+    RenderCreateSchema,
+    RenderOutput,
+    RenderResult,
+    RenderStage,
+    RenderStatus,
+)
+
+
+async def derive_image(
+    image: RenderedImage, output: RenderOutput, template_name: str | None = None
+) -> RenderedImage:
+    with timed("encode", template_name):
+        return await cpu_executor.run(
+            image.derive,
+            (output.format or Settings.RENDER_OUTPUT_FORMAT).upper(),
+            output.quality or Settings.RENDER_OUTPUT_QUALITY,
+            output.width,
+            output.height,
+            output.fit,
+        )
 
 
 async def upload_image(
-    image: Image.Image,
+    image: RenderedImage,
     image_name: str,
-    user_id: uuid.UUID,
+    user_id: uuid.UUID | None,
     file_upload_dir: str = "renders",
+    template_name: str | None = None,
 ):
-    ufiles_client = ufiles.AsyncUFiles(
-        ufiles_base_url=Settings.UFILES_BASE_URL,
-        usso_base_url=Settings.USSO_BASE_URL,
-        api_key=Settings.UFILES_API_KEY,
-    )
-    image_bytes = imagetools.convert_image_bytes(image, "JPEG", 90)
     base_name = (
         ".".join(image_name.split(".")[:-1]) if "." in image_name else image_name
     )
-    image_bytes.name = f"{base_name}.jpg"
-    return await ufiles_client.upload_bytes(
-        image_bytes,
-        filename=f"{file_upload_dir}/{image_bytes.name}",
-        public_permission=json.dumps({"permission": ufiles.PermissionEnum.READ}),
-        user_id=str(user_id),
-        # meta_data={},
+    filename = f"{base_name}.{EXTENSIONS.get(image.format, image.format.lower())}"
+    data = {
+        "filename": f"{file_upload_dir}/{filename}",
+        "public_permission": json.dumps({"permission": ufiles.PermissionEnum.READ}),
+    }
+    if user_id:
+        data["user_id"] = str(user_id)
+    headers = {}
+    if Settings.UFILES_API_KEY:
+        headers["x-api-key"] = Settings.UFILES_API_KEY
+
+    async def upload():
+        with timed("upload", template_name):
+            # posted on the pooled client rather than through AsyncUFiles,
+            # a singleton that cannot be reopened once its client is closed
+            response = await clients.ufiles.post(
+                f"{Settings.UFILES_BASE_URL.rstrip('/')}/upload",
+                headers=headers,
+                files={"file": (data["filename"], image.data)},
+                data=data,
+            )
+            response.raise_for_status()
+            return ufiles.UFileItem(**response.json())
+
+    return await upstreams["ufiles"].call(upload)
+
+
+async def upload_outputs(
+    render: Render, result_image: RenderedImage
+) -> list[RenderResult]:
+    """Derive every requested output from one rendered image and upload them.
+
+    Resizing and encoding run on the CPU executor and uploads run
+    concurrently; without `outputs` the render has a single native result.
+    """
+    outputs = render.outputs or [RenderOutput()]
+
+    async def upload_output(index: int, output: RenderOutput) -> RenderResult:
+        image = await derive_image(result_image, output, render.template_name)
+        name = f"{render.uid}_{index}" if len(outputs) > 1 else str(render.uid)
+        image_ufile = await upload_image(
+            image,
+            image_name=name,
+            user_id=render.user_id,
+            file_upload_dir="renders",
+            template_name=render.template_name,
+        )
+        return RenderResult(
+            url=image_ufile.url,
+            width=image.width,
+            height=image.height,
+            template_name=render.template_name,
+            format=image.format,
+        )
+
+    return await asyncio.gather(
+        *[upload_output(index, output) for index, output in enumerate(outputs)]
     )
 
 
-async def fill_render_template_data(template_data: str, data: dict) -> dict:
-    jinja_template = jinja2.Template(template_data)
+def render_template_json(jinja_template: jinja2.Template, data: dict) -> dict:
     text = jinja_template.render(**data)
-    result = json.loads(text)
-    return result
+    return json.loads(text)
+
+
+async def fill_render_template_data(
+    jinja_template: jinja2.Template, data: dict, template_name: str | None = None
+) -> dict:
+    with timed("fill", template_name):
+        return await cpu_executor.run_thread(render_template_json, jinja_template, data)
+
+
+async def download_image_base64(url: str) -> str:
+    if url.startswith("data:image"):
+        return await cpu_executor.run(encode_data_url, url)
+    return await asset_cache.get_base64(url)
+
+
+@dataclass
+class CompiledTemplate:
+    jinja_template: jinja2.Template
+    digest: str
+    etag: str | None = None
+    last_modified: str | None = None
+    validated_at: float = 0
+
+    def is_fresh(self) -> bool:
+        age = time.monotonic() - self.validated_at
+        return age < Settings.TEMPLATE_REVALIDATE_AFTER
+
+    def validation_headers(self) -> dict[str, str]:
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+async def fetch_jinja_template(
+    template: Template, cached: CompiledTemplate | None
+) -> CompiledTemplate:
+    """Revalidate or fetch the MWJ body; it is only compiled again when its
+    content changed."""
+    headers = cached.validation_headers() if cached else {}
+    with timed("template_fetch", template.name):
+        r = await clients.templates.get(template.url, headers=headers)
+        if r.status_code != 304 or cached is None:
+            r.raise_for_status()
+
+    if r.status_code == 304 and cached is not None:
+        compiled = cached
+    else:
+        digest = hashlib.sha256(r.content).hexdigest()
+        if cached is not None and cached.digest == digest:
+            jinja_template = cached.jinja_template
+        else:
+            jinja_template = jinja2.Template(r.text)
+        compiled = CompiledTemplate(
+            jinja_template=jinja_template,
+            digest=digest,
+            etag=r.headers.get("ETag"),
+            last_modified=r.headers.get("Last-Modified"),
+        )
+    compiled.validated_at = time.monotonic()
+    compiled_templates.set(template, compiled)
+    return compiled
+
+
+# template url -> revalidation in flight, shared by concurrent renders
+_template_fetches: dict[str, asyncio.Task] = {}
 
 
-async def get_template_data(template_name: str) -> str:
+async def get_jinja_template(template: Template) -> jinja2.Template:
+    cached = compiled_templates.get(template)
+    if cached is not None and cached.is_fresh():
+        return cached.jinja_template
+
+    task = _template_fetches.get(template.url)
+    if task is None:
+        task = asyncio.ensure_future(fetch_jinja_template(template, cached))
+        _template_fetches[template.url] = task
+        task.add_done_callback(lambda _: _template_fetches.pop(template.url, None))
+    try:
+        return (await asyncio.shield(task)).jinja_template
+    except httpx.HTTPError as e:
+        if cached is None:
+            raise
+        logging.warning(f"Serving cached template {template.name}: {e}")
+        return cached.jinja_template
+
+
+async def get_rendering_template(
+    template_name: str,
+) -> tuple[Template, BindingPlan, jinja2.Template]:
     template = await Template.get_by_name(template_name)
-    async with httpx.AsyncClient() as client:
-        r = await client.get(template.url)
-        r.raise_for_status()
+    if template is None:
+        raise BaseHTTPException(
+            status_code=404,
+            error="template_not_found",
+            message=f"Template {template_name} not found",
+        )
+    return template, get_binding_plan(template), await get_jinja_template(template)
+
+
+async def download_images(images: dict | list[str], plan: BindingPlan) -> dict:
+    if isinstance(images, dict):
+        downloaded_images = await asyncio.gather(
+            *[download_image_base64(value) for value in images.values()]
+        )
+        return dict(zip(images.keys(), downloaded_images))
+    return plan.bind_images(images)
+
 
-    return r.text
+def bind_template_data(
+    plan: BindingPlan,
+    render: Render | RenderGroup,
+    images: dict,
+    logo: str | None,
+) -> dict:
+    return (
+        plan.bind_texts(render.texts)
+        | plan.bind_fonts(render.fonts)
+        | plan.bind_colors(render.colors)
+        | images
+        | {"logo": logo}
+    )
 
 
 async def rendering_template_data(
     template_name: str, render: Render | RenderGroup
 ) -> dict:
+    _, plan, jinja_template = await get_rendering_template(template_name)
 
-    def get_text_dict(texts: dict | list[str], template: Template) -> dict[str, str]:
-        if isinstance(texts, dict):
-            return texts.copy()
-
-        result = {}
-        for i, field in enumerate(template.fields):
-            if field.type != FieldType.text:
-                continue
-            result[field.name] = texts[i] if len(texts) > i else field.default
-        return result
-
-    async def get_image_dict(
-        images: dict | list[str], template: Template
-    ) -> dict[str, str]:
-        if isinstance(images, dict):
-            downloaded_images = await asyncio.gather(
-                *[imagetools.download_image_base64(value) for value in images.values()]
-            )
-            return dict(zip(images.keys(), downloaded_images))
-
-        result = {}
-        for i, field in enumerate(template.fields):
-            if field.type != FieldType.image:
-                continue
-            result[field.name] = images[i] if len(images) > i else field.default
-        return result
-
-    def get_font_dict(fonts: list[str] | str, template: Template) -> dict[str, str]:
-        if isinstance(fonts, str):
-            fonts = [fonts] * len(template.fonts)
-        template_font = template.fonts[0] if len(template.fonts) > 0 else "Vazirmatn"
-        data = {"font": fonts[0] if len(fonts) > 0 else template_font}
-        for i, font in enumerate(template.fonts):
-            data[f"font{i+1}"] = fonts[i] if len(fonts) > i else font
-        return data
-
-    def get_color_dict(colors: list[str], template: Template) -> dict[str, str]:
-        template_color = template.colors[0] if len(template.colors) > 0 else "#000000"
-        data = {"color": colors[0] if len(colors) > 0 else template_color}
-        for i, color in enumerate(template.colors):
-            data[f"color{i+1}"] = colors[i] if len(colors) > i else color
-        return data
-
-    template_data = await get_template_data(template_name)
-    template = await Template.get_by_name(template_name)
+    images = await download_images(render.images, plan)
+    logo = await download_image_base64(render.logo) if render.logo else None
+    await events.publish(render.uid, RenderStage.assets_fetched)
 
-    data = (
-        get_text_dict(render.texts, template)
-        | get_font_dict(render.fonts, template)
-        | get_color_dict(render.colors, template)
-        | await get_image_dict(render.images, template)
-        | {
-            "logo": (
-                await imagetools.download_image_base64(render.logo)
-                if render.logo
-                else None
-            )
-        }
-    )
-
-    mwj = await fill_render_template_data(template_data, data)
+    data = bind_template_data(plan, render, images=images, logo=logo)
+    mwj = await fill_render_template_data(jinja_template, data, template_name)
+    await events.publish(render.uid, RenderStage.mwj_filled)
     return mwj
 
 
-@basic.retry_execution(attempts=3, delay=1)
-async def render_mwj(mwj: dict) -> Image.Image:
-    # logging.info(f"Rendering mwj: {mwj}")
-    with open("logs/mwj.json", "w") as f:
-        json.dump(mwj, f, indent=4, ensure_ascii=False)
+def renderer_headers() -> dict[str, str]:
+    headers = {"x-api-key": Settings.RENDER_API_KEY}
+    if Settings.RENDER_ACCEPT_BINARY:
+        headers["Accept"] = "image/*, application/json;q=0.9"
+    return headers
 
-    async with httpx.AsyncClient() as client:
-        r = await client.post(
-            Settings.MWJ_RENDER_URL,
-            json={"template": mwj},
-            headers={"x-api-key": Settings.RENDER_API_KEY},
-        )
-        r.raise_for_status()
 
-    base64_str = r.json().get("result")
-    # logging.info(base64_str)
-    return imagetools.load_from_base64(base64_str)
+def parse_render_result(content: bytes) -> RenderedImage:
+    return RenderedImage.from_base64(json.loads(content).get("result"))
 
 
-async def process_render(render: Render) -> Render:
+def parse_bulk_render_results(content: bytes) -> list[RenderedImage]:
+    return [RenderedImage.from_base64(item) for item in json.loads(content)["results"]]
+
+
+class RenderBackend(abc.ABC):
+    """Turns a filled MWJ template into an image."""
+
+    name = "renderer"
+
+    def supports(self, mwj: dict) -> bool:
+        return True
+
+    @abc.abstractmethod
+    async def render(
+        self, mwj: dict, template_name: str | None = None
+    ) -> RenderedImage: ...
+
+
+class RemoteRenderBackend(RenderBackend):
+    """The MWJ render service, balanced across MWJ_RENDER_URLS."""
+
+    name = "remote"
+
+    async def render(
+        self, mwj: dict, template_name: str | None = None
+    ) -> RenderedImage:
+        async def post() -> httpx.Response:
+            with timed("renderer", template_name):
+                return await renderers.post(
+                    json={"template": mwj}, headers=renderer_headers(), hedge=True
+                )
+
+        r = await upstreams["renderer"].call(post)
+
+        with timed("decode", template_name):
+            if r.headers.get("content-type", "").startswith("image/"):
+                return await cpu_executor.run(RenderedImage.from_bytes, r.content)
+            return await cpu_executor.run(parse_render_result, r.content)
+
+
+class LocalRenderBackend(RenderBackend):
+    """Pillow compositing of simple templates in a local process pool."""
+
+    name = "local"
+
+    def __init__(self, fonts_dir: str, executor: CPUExecutor):
+        self.fonts_dir = fonts_dir
+        self.executor = executor
+
+    def supports(self, mwj: dict) -> bool:
+        return compositor.supports(mwj, self.fonts_dir)
+
+    async def render(
+        self, mwj: dict, template_name: str | None = None
+    ) -> RenderedImage:
+        with timed("local_render", template_name):
+            data = await self.executor.run(compositor.composite, mwj, self.fonts_dir)
+        return RenderedImage.from_bytes(data)
+
+
+local_executor = CPUExecutor(
+    Settings.RENDER_LOCAL_EXECUTOR, Settings.RENDER_LOCAL_WORKERS
+)
+
+
+def create_render_backends(mode: str = Settings.RENDER_LOCAL) -> list[RenderBackend]:
+    remote = RemoteRenderBackend()
+    local = LocalRenderBackend(Settings.RENDER_FONTS_DIR, local_executor)
+    if mode == "prefer":
+        return [local, remote]
+    if mode == "fallback":
+        return [remote, local]
+    return [remote]
+
+
+render_backends = create_render_backends()
+
+
+async def render_mwj(
+    mwj: dict, name: str = "mwj", template_name: str | None = None
+) -> RenderedImage:
+    """Render with the first backend that supports `mwj`, falling back to the
+    next one when it fails."""
+    debug_capture.capture(name, mwj)
+
+    backends = [backend for backend in render_backends if backend.supports(mwj)]
+    for backend in backends[:-1]:
+        try:
+            return await backend.render(mwj, template_name)
+        except Exception as e:
+            logging.warning(f"{backend.name} render of {name} failed: {e}")
+    return await backends[-1].render(mwj, template_name)
+
+
+async def complete_render(render: Render, result_image: RenderedImage) -> Render:
+    render.results.extend(await upload_outputs(render, result_image))
+    await events.publish(render.uid, RenderStage.uploaded)
+    render.status = RenderStatus.completed
+    await render.save()
+    await events.publish(render.uid, RenderStage.completed, results=render.results)
+    return render
+
+
+def hash_mwj(mwj: dict) -> str:
+    text = json.dumps(mwj, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+async def prepare_render(render: Render) -> dict:
     mwj = await rendering_template_data(render.template_name, render)
+    render.mwj_hash = await cpu_executor.run(hash_mwj, mwj)
+    return mwj
 
-    result_image = await render_mwj(mwj)
-    image_ufile = await upload_image(
-        result_image,
-        image_name=f"{render.id}.png",
-        user_id=render.user_id,
-        file_upload_dir="renders",
-    )
-    render.results.append(
-        RenderResult(
-            url=image_ufile.url, width=result_image.width, height=result_image.height
-        )
+
+async def find_cached_render(render: Render) -> Render | None:
+    if not render.use_cache or Settings.RENDER_CACHE_TTL <= 0:
+        return None
+
+    query = {
+        "mwj_hash": render.mwj_hash,
+        "status": RenderStatus.completed,
+        "is_deleted": False,
+        "created_at": {
+            "$gte": datetime.now() - timedelta(seconds=Settings.RENDER_CACHE_TTL)
+        },
+    }
+    if Settings.RENDER_CACHE_SCOPE == "owner":
+        query["user_id"] = render.user_id
+    # a cached render is only reusable if it produced the same outputs
+    query["outputs"] = (
+        [output.model_dump(mode="json") for output in render.outputs]
+        if render.outputs
+        else {"$in": [[], None]}
     )
+    return await Render.find(query).sort("-created_at").first_or_none()
+
+
+async def reuse_cached_render(render: Render) -> Render | None:
+    cached = await find_cached_render(render)
+    if cached is None or not cached.results:
+        return None
+
+    render.results.extend(result.model_copy() for result in cached.results)
+    render.status = RenderStatus.completed
     await render.save()
+    await events.publish(render.uid, RenderStage.completed, results=render.results)
     return render
 
 
-async def render_bulk(data: list[dict]) -> list[Image.Image]:
-    with open("logs/mwj.json", "w") as f:
-        json.dump(data, f, indent=4, ensure_ascii=False)
-    async with httpx.AsyncClient() as client:
-        r = await client.post(
-            f"{Settings.MWJ_RENDER_URL}/bulk",
-            json={"templates": data, "data": {"name": "test"}},
-            headers={"x-api-key": Settings.RENDER_API_KEY},
+async def process_render(render: Render) -> Render:
+    mwj = await prepare_render(render)
+    if await reuse_cached_render(render):
+        return render
+    return await render_prepared(render, mwj)
+
+
+async def render_prepared(
+    render: Render, mwj: dict, result_image: RenderedImage | None = None
+) -> Render:
+    """Complete `render` with `result_image`, rendering `mwj` on its own
+    without one; a render already completed from the cache is returned."""
+    if render.status == RenderStatus.completed:
+        return render
+    if result_image is None:
+        result_image = await render_mwj(
+            mwj, name=str(render.uid), template_name=render.template_name
         )
-        r.raise_for_status()
-    renders = r.json().get("results")
-    output = []
-    for render in renders:
-        output.append(imagetools.load_from_base64(render))
-    return output
+        await events.publish(render.uid, RenderStage.rendered)
+    return await complete_render(render, result_image)
 
 
-async def upload_image_result(
-    result_image: Image.Image, basename: str, user_id: uuid.UUID
-):
-    width, height = result_image.size
-    image_ufile = await upload_image(
-        result_image,
-        image_name=f"{basename}_{width}x{height}.png",
-        user_id=user_id,
-        file_upload_dir="renders",
-    )
-    return RenderResult(
-        url=image_ufile.url,
-        width=width,
-        height=height,
+async def render_bulk(data: list[dict], name: str = "bulk") -> list[RenderedImage]:
+    debug_capture.capture(name, data)
+
+    async def post() -> httpx.Response:
+        with timed("renderer_bulk"):
+            return await renderers.post(
+                "/bulk",
+                json={"templates": data, "data": {"name": "test"}},
+                headers={"x-api-key": Settings.RENDER_API_KEY},
+            )
+
+    # failed bulk calls fall back to single renders, which retry on their own
+    r = await upstreams["renderer"].call(post, attempts=1)
+    with timed("decode_bulk"):
+        return await cpu_executor.run(parse_bulk_render_results, r.content)
+
+
+def create_group_render(render_group: RenderGroup, template_name: str) -> Render:
+    return Render(
+        **render_group.model_dump(
+            include=set(RenderCreateSchema.model_fields) | {"user_id"}
+        ),
+        template_name=template_name,
+        status=RenderStatus.processing,
     )
 
 
+async def render_bulk_images(
+    renders: list[Render], mwjs: list[dict], name: str = "bulk"
+) -> dict[int, RenderedImage]:
+    """Render prepared renders with one `/bulk` call.
+
+    Renders with a reusable cached result are completed in place. Returns the
+    rendered images by index in `renders`; renders left out, because the
+    local backend is preferred for them or the bulk call failed or is
+    disabled, are for `render_prepared` to render one by one.
+    """
+    cached = await asyncio.gather(*[reuse_cached_render(render) for render in renders])
+    pending = [i for i, render in enumerate(cached) if render is None]
+    preferred = render_backends[0]
+    if isinstance(preferred, LocalRenderBackend):
+        pending = [i for i in pending if not preferred.supports(mwjs[i])]
+    if not pending or not Settings.RENDER_BULK_ENDPOINT:
+        return {}
+
+    try:
+        result_images = await render_bulk([mwjs[i] for i in pending], name)
+    except Exception as e:
+        logging.warning(f"Bulk render failed, rendering one by one: {e}")
+        return {}
+    if len(result_images) != len(pending):
+        logging.warning(
+            f"Bulk render returned {len(result_images)} images "
+            f"for {len(pending)} renders, rendering one by one"
+        )
+        return {}
+    return dict(zip(pending, result_images))
+
+
 async def process_render_bulk(render_group: RenderGroup) -> RenderGroup:
     template_group = await TemplateGroup.get_by_name(render_group.group_name)
-    render_requests = [
-        Render(**render_group.model_dump(), template_name=template_name)
+    renders = [
+        create_group_render(render_group, template_name)
         for template_name in template_group.template_names
     ]
-    # renders: list[Render] = []
-    for render_request in render_requests:
-        render = await process_render(render_request)
-        render_group.results.extend(render.results)
-        render_group.render_ids.append(render.uid)
-        # renders.append(render)
-        await asyncio.sleep(0.1)
-
-    await render_group.save()
-    return render_group
 
+    mwjs, result_images = None, {}
+    try:
+        mwjs = await asyncio.gather(*[prepare_render(render) for render in renders])
+    except Exception as e:
+        # each template is prepared again and reports its own error
+        logging.warning(f"Preparing group {render_group.uid} failed: {e}")
+    else:
+        result_images = await render_bulk_images(renders, mwjs, str(render_group.uid))
+
+    semaphore = asyncio.Semaphore(Settings.RENDER_BULK_CONCURRENCY)
+
+    async def render_template(index: int, render: Render) -> Render:
+        async with semaphore:
+            if mwjs is None:
+                return await process_render(render)
+            return await render_prepared(render, mwjs[index], result_images.get(index))
+
+    async def process(index: int, render: Render) -> Render:
+        try:
+            render = await render_template(index, render)
+        except Exception as e:
+            await events.publish(
+                render_group.uid,
+                RenderStage.template_error,
+                template_name=render.template_name,
+                error=str(e),
+            )
+            raise
+        await events.publish(
+            render_group.uid,
+            RenderStage.template_completed,
+            template_name=render.template_name,
+            results=render.results,
+        )
+        return render
 
-async def _process_render_bulk(render_group: RenderGroup) -> RenderGroup:
-    template_group = await TemplateGroup.get_by_name(render_group.group_name)
-
-    rendering_templates = await asyncio.gather(
-        *[
-            rendering_template_data(template_name, render_group)
-            for template_name in template_group.template_names
-        ]
-    )
-
-    result_images = await render_bulk(rendering_templates)
-
-    texts = (
-        list(render_group.texts.values())
-        if isinstance(render_group.texts, dict)
-        else render_group.texts
+    outcomes = await asyncio.gather(
+        *[process(i, render) for i, render in enumerate(renders)],
+        return_exceptions=True,
     )
-    basename = texttools.sanitize_filename(texts[0] if texts else "")
 
-    render_group.results.append(
-        await upload_image_result(result_images[0], basename, render_group.user_id)
-    )
-    others = await asyncio.gather(
-        *[
-            upload_image_result(result_image, basename, render_group.user_id)
-            for result_image in result_images[1:]
-        ]
+    failed: list[Render] = []
+    for render, outcome in zip(renders, outcomes):
+        if isinstance(outcome, BaseException):
+            render.status = RenderStatus.error
+            render.error = str(outcome)
+            render_group.errors[render.template_name] = str(outcome)
+            failed.append(render)
+            continue
+        render_group.results.extend(outcome.results)
+        render_group.render_ids.append(outcome.uid)
+    await asyncio.gather(*[render.save() for render in failed])
+
+    render_group.status = (
+        RenderStatus.error
+        if failed and len(failed) == len(renders)
+        else RenderStatus.completed
     )
-    render_group.results.extend(others)
     await render_group.save()
+    await events.publish(
+        render_group.uid,
+        RenderStage(render_group.status.value),
+        results=render_group.results,
+    )
     return render_group
+
+
+async def run_render(item: Render | RenderGroup) -> Render | RenderGroup:
+    await events.publish(item.uid, RenderStage.processing)
+    try:
+        if isinstance(item, RenderGroup):
+            return await process_render_bulk(item)
+        return await process_render(item)
+    except Exception as e:
+        item.status = RenderStatus.error
+        item.error = str(e)
+        await item.save()
+        await events.publish(item.uid, RenderStage.error, error=item.error)
+        raise
+
+
+async def warmup(limit: int = Settings.WARMUP_TEMPLATES):
+    """Compile the templates used by recent renders before taking traffic."""
+    if limit <= 0:
+        return
+
+    since = datetime.now() - timedelta(days=1)
+    names = await Render.distinct("template_name", {"created_at": {"$gte": since}})
+    templates = await Template.find({"name": {"$in": names[:limit]}}).to_list()
+    results = await asyncio.gather(
+        *[get_jinja_template(template) for template in templates],
+        return_exceptions=True,
+    )
+    warmed = sum(not isinstance(result, BaseException) for result in results)
+    logging.info(f"Warmed up {warmed}/{len(templates)} templates")
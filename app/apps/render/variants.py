@@ -0,0 +1,218 @@
+import asyncio
+import itertools
+import logging
+import uuid
+from dataclasses import dataclass
+from typing import AsyncIterator
+
+import jinja2
+from apps.template.models import TemplateGroup
+from fastapi_mongo_base.core.exceptions import BaseHTTPException
+from server.config import Settings
+from server.executor import cpu_executor
+
+from . import events
+from .models import Render
+from .schemas import RenderStage, RenderStatus, RenderVariantsCreateSchema
+from .services import (
+    bind_template_data,
+    complete_render,
+    download_image_base64,
+    fill_render_template_data,
+    get_rendering_template,
+    hash_mwj,
+    render_bulk_images,
+    render_prepared,
+)
+
+
+@dataclass
+class Variant:
+    index: int
+    render: Render
+    jinja_template: jinja2.Template
+    template_data: dict
+
+
+# batches keep rendering if the client stops reading the stream
+_tasks: set[asyncio.Task] = set()
+
+
+def variant_matrix(data: RenderVariantsCreateSchema) -> list[dict]:
+    return [
+        {"texts": texts, "fonts": fonts, "images": images, "colors": colors}
+        for texts, fonts, images, colors in itertools.product(
+            data.texts, data.fonts, data.images, data.colors
+        )
+    ]
+
+
+async def get_template_names(data: RenderVariantsCreateSchema) -> list[str]:
+    if data.template_name:
+        return [data.template_name]
+
+    template_group = await TemplateGroup.get_by_name(data.group_name)
+    if template_group is None:
+        raise BaseHTTPException(
+            status_code=404,
+            error="template_group_not_found",
+            message=f"Template group {data.group_name} not found",
+        )
+    return template_group.template_names
+
+
+async def download_assets(data: RenderVariantsCreateSchema) -> dict[str, str]:
+    urls = {
+        url
+        for images in data.images
+        if isinstance(images, dict)
+        for url in images.values()
+    }
+    if data.logo:
+        urls.add(data.logo)
+    urls = list(urls)
+    return dict(
+        zip(urls, await asyncio.gather(*[download_image_base64(url) for url in urls]))
+    )
+
+
+async def prepare_variants(
+    data: RenderVariantsCreateSchema, user_id: uuid.UUID
+) -> list[Variant]:
+    """Create a render for every template and variant combination.
+
+    Templates, compiled jinja and assets are resolved once for the whole
+    matrix; texts are validated before anything is stored. MWJs are filled
+    per batch in `render_batch`, so only the bound template data is kept.
+    """
+    template_names = await get_template_names(data)
+    if data.size * len(template_names) > Settings.RENDER_VARIANTS_MAX:
+        raise BaseHTTPException(
+            status_code=400,
+            error="too_many_variants",
+            message=f"At most {Settings.RENDER_VARIANTS_MAX} renders per request",
+        )
+
+    templates = await asyncio.gather(
+        *[get_rendering_template(name) for name in template_names]
+    )
+    assets = await download_assets(data)
+    matrix = variant_matrix(data)
+
+    variants: list[Variant] = []
+    for template_name, (_, plan, jinja_template) in zip(template_names, templates):
+        for index, variant in enumerate(matrix):
+            render = Render(
+                **variant,
+                template_name=template_name,
+                logo=data.logo,
+                meta_data=data.meta_data,
+                use_cache=data.use_cache,
+                outputs=data.outputs,
+                user_id=user_id,
+                status=RenderStatus.processing,
+            )
+            images = (
+                {key: assets[url] for key, url in render.images.items()}
+                if isinstance(render.images, dict)
+                else plan.bind_images(render.images)
+            )
+            template_data = bind_template_data(
+                plan, render, images, assets.get(data.logo)
+            )
+            variants.append(
+                Variant(
+                    index=index,
+                    render=render,
+                    jinja_template=jinja_template,
+                    template_data=template_data,
+                )
+            )
+
+    if variants:
+        renders = [variant.render for variant in variants]
+        result = await Render.insert_many(renders)
+        for render, inserted_id in zip(renders, result.inserted_ids):
+            render.id = inserted_id
+    return variants
+
+
+async def fill_variant(variant: Variant) -> dict:
+    render = variant.render
+    mwj = await fill_render_template_data(
+        variant.jinja_template, variant.template_data, render.template_name
+    )
+    render.mwj_hash = await cpu_executor.run(hash_mwj, mwj)
+    return mwj
+
+
+async def fail_variant(variant: Variant, e: Exception):
+    render = variant.render
+    logging.error(f"Variant render {render.uid} failed: {e}")
+    render.status = RenderStatus.error
+    render.error = str(e)
+    await render.save()
+    await events.publish(render.uid, RenderStage.error, error=render.error)
+
+
+async def render_batch(batch: list[Variant]) -> list[Variant]:
+    """Fill and render a batch with one renderer call, reusing cached results.
+
+    Failures are stored on the render instead of failing the batch. The
+    batch's MWJs are dropped once it completes.
+    """
+    filled = await asyncio.gather(
+        *[fill_variant(variant) for variant in batch], return_exceptions=True
+    )
+    ready: list[tuple[Variant, dict]] = []
+    failed = []
+    for variant, mwj in zip(batch, filled):
+        if isinstance(mwj, Exception):
+            failed.append(fail_variant(variant, mwj))
+        else:
+            ready.append((variant, mwj))
+    await asyncio.gather(*failed)
+
+    renders = [variant.render for variant, _ in ready]
+    result_images = (
+        await render_bulk_images(
+            renders, [mwj for _, mwj in ready], name=f"variants_{renders[0].uid}"
+        )
+        if ready
+        else {}
+    )
+
+    async def complete(index: int, variant: Variant, mwj: dict):
+        try:
+            await render_prepared(variant.render, mwj, result_images.get(index))
+        except Exception as e:
+            await fail_variant(variant, e)
+
+    await asyncio.gather(
+        *[complete(i, variant, mwj) for i, (variant, mwj) in enumerate(ready)]
+    )
+    for variant in batch:
+        variant.template_data = {}
+    return batch
+
+
+async def render_variants(variants: list[Variant]) -> AsyncIterator[Variant]:
+    """Render variants in `/bulk` batches, yielding each batch as it completes."""
+    size = max(1, Settings.RENDER_VARIANTS_BATCH_SIZE)
+    semaphore = asyncio.Semaphore(Settings.RENDER_BULK_CONCURRENCY)
+
+    async def run(batch: list[Variant]) -> list[Variant]:
+        async with semaphore:
+            return await render_batch(batch)
+
+    tasks = [
+        asyncio.create_task(run(variants[i : i + size]))
+        for i in range(0, len(variants), size)
+    ]
+    for task in tasks:
+        _tasks.add(task)
+        task.add_done_callback(_tasks.discard)
+
+    for next_batch in asyncio.as_completed(tasks):
+        for variant in await next_batch:
+            yield variant
@@ -0,0 +1,116 @@
+import logging
+import re
+from dataclasses import dataclass
+
+from fastapi_mongo_base.core.exceptions import BaseHTTPException
+
+from .cache import binding_plans
+from .schemas import FieldType, TemplateSchema
+
+
+@dataclass(frozen=True)
+class FieldSlot:
+    index: int
+    name: str
+    default: str | None = None
+    pattern: re.Pattern | None = None
+
+    def validate(self, value):
+        if self.pattern is None or value is None:
+            return
+        if not self.pattern.fullmatch(str(value)):
+            raise BaseHTTPException(
+                status_code=400,
+                error="invalid_field",
+                message=f"Value for field '{self.name}' does not match its validation",
+            )
+
+
+def compile_validation(field_name: str, validation: str | None) -> re.Pattern | None:
+    if not validation:
+        return None
+    try:
+        return re.compile(validation)
+    except re.error as e:
+        logging.warning(f"Ignoring invalid validation for field {field_name}: {e}")
+        return None
+
+
+@dataclass(frozen=True)
+class BindingPlan:
+    """How render payloads map onto a template's jinja variables.
+
+    Positional texts and images are indexed over all `template.fields`, so a
+    slot's `index` is its position in that list rather than among its type.
+    """
+
+    texts: tuple[FieldSlot, ...]
+    images: tuple[FieldSlot, ...]
+    fonts: tuple[str, ...]
+    colors: tuple[str, ...]
+
+    @classmethod
+    def from_template(cls, template: TemplateSchema) -> "BindingPlan":
+        def slots(field_type: FieldType) -> tuple[FieldSlot, ...]:
+            return tuple(
+                FieldSlot(
+                    index=i,
+                    name=field.name,
+                    default=field.default,
+                    pattern=compile_validation(field.name, field.validation),
+                )
+                for i, field in enumerate(template.fields)
+                if field.type == field_type
+            )
+
+        return cls(
+            texts=slots(FieldType.text),
+            images=slots(FieldType.image),
+            fonts=tuple(template.fonts),
+            colors=tuple(template.colors),
+        )
+
+    @staticmethod
+    def _bind(slots: tuple[FieldSlot, ...], values: list) -> dict:
+        return {
+            slot.name: values[slot.index] if len(values) > slot.index else slot.default
+            for slot in slots
+        }
+
+    def bind_texts(self, texts: dict | list[str]) -> dict:
+        if isinstance(texts, dict):
+            for slot in self.texts:
+                slot.validate(texts.get(slot.name))
+            return texts.copy()
+
+        for slot in self.texts:
+            if len(texts) > slot.index:
+                slot.validate(texts[slot.index])
+        return self._bind(self.texts, texts)
+
+    def bind_images(self, images: list[str]) -> dict:
+        return self._bind(self.images, images)
+
+    def bind_fonts(self, fonts: list[str] | str) -> dict[str, str]:
+        if isinstance(fonts, str):
+            fonts = [fonts] * len(self.fonts)
+        template_font = self.fonts[0] if self.fonts else "Vazirmatn"
+        data = {"font": fonts[0] if fonts else template_font}
+        for i, font in enumerate(self.fonts):
+            data[f"font{i+1}"] = fonts[i] if len(fonts) > i else font
+        return data
+
+    def bind_colors(self, colors: list[str]) -> dict[str, str]:
+        template_color = self.colors[0] if self.colors else "#000000"
+        data = {"color": colors[0] if colors else template_color}
+        for i, color in enumerate(self.colors):
+            data[f"color{i+1}"] = colors[i] if len(colors) > i else color
+        return data
+
+
+def get_binding_plan(template: TemplateSchema) -> BindingPlan:
+    plan = binding_plans.get(template)
+    if plan is None:
+        plan = BindingPlan.from_template(template)
+        binding_plans.set(template, plan)
+    return plan
@@ -0,0 +1,71 @@
+from server.cache import LRUCache
+from server.config import Settings
+
+from .schemas import TemplateSchema
+
+
+def template_version(template: TemplateSchema) -> str:
+    return f"{template.url}@{template.updated_at.timestamp()}"
+
+
+class TemplateVersionCache:
+    """Values derived from a template, keyed by template name and version.
+
+    Used for compiled MWJ jinja templates and field binding plans.
+    """
+
+    def __init__(self, maxsize: int):
+        self._cache = LRUCache(maxsize)
+
+    def get(self, template: TemplateSchema):
+        return self._cache.get((template.name, template_version(template)))
+
+    def set(self, template: TemplateSchema, value):
+        self._cache.set((template.name, template_version(template)), value)
+
+    def invalidate(self, name: str) -> int:
+        return self._cache.pop_matching(lambda key: key[0] == name)
+
+    def clear(self):
+        self._cache.clear()
+
+
+class DocumentCache:
+    """Read-through cache of template documents keyed by name.
+
+    Entries are dropped by the template routes on writes, by the change stream
+    watcher when it runs, and otherwise expire after `ttl` seconds. Lookups
+    return shallow copies so callers cannot mutate the cached document.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self._cache = LRUCache(maxsize, ttl=ttl)
+
+    def get(self, name: str):
+        document = self._cache.get(name)
+        return document.model_copy() if document is not None else None
+
+    def set(self, name: str, document):
+        self._cache.set(name, document.model_copy())
+
+    def invalidate(self, *names: str):
+        for name in names:
+            self._cache.pop(name)
+
+    def invalidate_id(self, document_id):
+        for name, document in self._cache.items():
+            if document.id == document_id:
+                self._cache.pop(name)
+
+    def clear(self):
+        self._cache.clear()
+
+
+compiled_templates = TemplateVersionCache(Settings.TEMPLATE_CACHE_SIZE)
+binding_plans = TemplateVersionCache(Settings.TEMPLATE_CACHE_SIZE)
+template_documents = DocumentCache(
+    Settings.TEMPLATE_METADATA_CACHE_SIZE, Settings.TEMPLATE_METADATA_CACHE_TTL
+)
+template_group_documents = DocumentCache(
+    Settings.TEMPLATE_METADATA_CACHE_SIZE, Settings.TEMPLATE_METADATA_CACHE_TTL
+)
@@ -2,28 +2,61 @@ import asyncio
 import uuid
 
 from fastapi_mongo_base.models import BaseEntity
-from pymongo import ASCENDING, IndexModel
+from pydantic import BaseModel
+from pymongo import ASCENDING, DESCENDING, IndexModel
 
-from .schemas import TemplateGroupSchema, TemplateSchema
+from .cache import template_documents, template_group_documents
+from .schemas import FieldSchema, TemplateGroupSchema, TemplateSchema
 
 
 class Template(TemplateSchema, BaseEntity):
     creator_id: uuid.UUID | None = None
+    # mwj hash the previews were rendered from
+    preview_hash: str | None = None
 
     class Settings:
         indexes = BaseEntity.Settings.indexes + [
             IndexModel([("name", ASCENDING)], unique=True),
+            # gallery filters, each sorted newest first like the list route
+            *[
+                IndexModel(
+                    [
+                        ("is_deleted", ASCENDING),
+                        (field, ASCENDING),
+                        ("created_at", DESCENDING),
+                        ("_id", DESCENDING),
+                    ]
+                )
+                for field in ("category", "tags", "license", "ad_type")
+            ],
+            IndexModel(
+                [
+                    ("is_deleted", ASCENDING),
+                    ("created_at", DESCENDING),
+                    ("_id", DESCENDING),
+                ]
+            ),
         ]
 
     @classmethod
     async def get_by_name(cls, name: str) -> "Template":
-        return await cls.find_one({"name": name})
+        template = template_documents.get(name)
+        if template is None:
+            template = await cls.find_one({"name": name})
+            if template is not None:
+                template_documents.set(name, template)
+        return template
 
     @classmethod
     async def get_by_ad_type(cls, ad_type: str) -> "Template":
         return await cls.find_one({"ad_type": ad_type})
 
 
+class TemplateFields(BaseModel):
+    name: str
+    fields: list[FieldSchema] = []
+
+
 class TemplateGroup(TemplateGroupSchema, BaseEntity):
     class Settings:
         indexes = BaseEntity.Settings.indexes + [
@@ -32,13 +65,51 @@ class TemplateGroup(TemplateGroupSchema, BaseEntity):
 
     @classmethod
     async def get_by_name(cls, name: str) -> "TemplateGroup":
-        return await cls.find_one({"name": name})
+        template_group = template_group_documents.get(name)
+        if template_group is None:
+            template_group = await cls.find_one({"name": name})
+            if template_group is not None:
+                template_group_documents.set(name, template_group)
+        return template_group
 
     async def get_templates(self) -> list[Template]:
         return await asyncio.gather(
             *[Template.get_by_name(name) for name in self.template_names]
         )
 
-    async def get_fields(self) -> list[str]:
-        templates = await self.get_templates()
-        return list({field for template in templates for field in template.fields})
+    async def get_fields(self) -> list[FieldSchema]:
+        return (await self.get_fields_many([self]))[0]
+
+    @classmethod
+    async def get_fields_many(
+        cls, groups: list["TemplateGroup"]
+    ) -> list[list[FieldSchema]]:
+        """Aggregate `fields` for several groups with at most one query.
+
+        Templates already in the metadata cache are used as is; the rest are
+        loaded together with a `name`/`fields` projection.
+        """
+        names = {name for group in groups for name in group.template_names}
+        fields: dict[str, list[FieldSchema]] = {}
+        for name in names:
+            template = template_documents.get(name)
+            if template is not None:
+                fields[name] = template.fields
+
+        missing = list(names - fields.keys())
+        if missing:
+            async for template in Template.find(
+                {"name": {"$in": missing}}, projection_model=TemplateFields
+            ):
+                fields[template.name] = template.fields
+
+        return [
+            list(
+                dict.fromkeys(
+                    field
+                    for name in group.template_names
+                    for field in fields.get(name, [])
+                )
+            )
+            for group in groups
+        ]
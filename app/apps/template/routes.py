@@ -1,13 +1,22 @@
 from datetime import datetime
+from typing import Literal
 from uuid import UUID
 
+from apps.render.previews import schedule_previews
 from fastapi import Query, Request
 from fastapi_mongo_base.routes import AbstractBaseRouter
 from fastapi_mongo_base.schemas import PaginatedResponse
+from server import listing
 from server.config import Settings
 from usso import UserData
 from usso.fastapi import jwt_access_security
 
+from .cache import (
+    binding_plans,
+    compiled_templates,
+    template_documents,
+    template_group_documents,
+)
 from .models import Template, TemplateGroup
 from .schemas import (
     TemplateCreateSchema,
@@ -28,6 +37,11 @@ class TemplateRouter(AbstractBaseRouter[Template, TemplateSchema]):
             return None
         return jwt_access_security(request)
 
+    def config_routes(self, **kwargs):
+        kwargs["list_route"] = False
+        super().config_routes(**kwargs)
+        listing.add_list_route(self)
+
     async def list_items(
         self,
         request: Request,
@@ -36,27 +50,62 @@ class TemplateRouter(AbstractBaseRouter[Template, TemplateSchema]):
         created_at_from: datetime | None = None,
         created_at_to: datetime | None = None,
         name: str | None = None,
+        category: str | None = None,
+        tags: list[str] | None = Query(None),
+        license: Literal["free", "paid"] | None = None,
+        ad_type: str | None = None,
+        fields: str | None = None,
+        cursor: str | None = None,
     ):
-        return await self._list_items(
-            request=request,
-            offset=offset,
-            limit=limit,
+        """List newest first; `tags` must all match, `fields` projects and
+        `cursor` continues a page."""
+        conditions = self.model.get_queryset(
             created_at_from=created_at_from,
             created_at_to=created_at_to,
             name=name,
+            category=category,
+            license=license,
+            ad_type=ad_type,
+        )
+        if tags:
+            conditions.append({"tags": {"$all": tags}})
+        return await listing.list_page(
+            self.model,
+            self.list_item_schema,
+            conditions,
+            offset=offset,
+            limit=limit,
+            cursor=cursor,
+            fields=listing.parse_fields(fields, self.list_item_schema),
         )
 
     async def create_item(
         self, request: Request, data: TemplateCreateSchema
     ) -> Template:
-        return await super().create_item(request, data.model_dump())
+        template: Template = await super().create_item(request, data.model_dump())
+        template_documents.invalidate(template.name)
+        schedule_previews(template.name)
+        return template
 
     async def update_item(
         self, request: Request, uid: UUID, data: TemplateUpdateSchema
     ) -> Template:
-        return await super().update_item(
+        template: Template = await super().update_item(
             request, uid, data.model_dump(exclude_none=True, exclude_unset=True)
         )
+        template_documents.invalidate_id(template.id)
+        template_documents.invalidate(template.name)
+        compiled_templates.invalidate(template.name)
+        binding_plans.invalidate(template.name)
+        schedule_previews(template.name)
+        return template
+
+    async def delete_item(self, request: Request, uid: UUID) -> Template:
+        template: Template = await super().delete_item(request, uid)
+        template_documents.invalidate(template.name)
+        compiled_templates.invalidate(template.name)
+        binding_plans.invalidate(template.name)
+        return template
 
 
 class TemplateGroupRouter(AbstractBaseRouter):
@@ -94,9 +143,10 @@ class TemplateGroupRouter(AbstractBaseRouter):
             created_at_to=created_at_to,
             name=name,
         )
+        fields = await self.model.get_fields_many(items)
         items_in_schema = [
-            self.list_item_schema(**item.model_dump(), fields=await item.get_fields())
-            for item in items
+            self.list_item_schema(**item.model_dump(), fields=item_fields)
+            for item, item_fields in zip(items, fields)
         ]
 
         return PaginatedResponse(
@@ -118,6 +168,7 @@ class TemplateGroupRouter(AbstractBaseRouter):
         template_group: TemplateGroup = await super().create_item(
             request, data.model_dump()
         )
+        template_group_documents.invalidate(template_group.name)
         return TemplateGroupDetailSchema(
             **template_group.model_dump(), fields=await template_group.get_fields()
         )
@@ -125,9 +176,17 @@ class TemplateGroupRouter(AbstractBaseRouter):
     async def update_item(
         self, request: Request, uid: UUID, data: TemplateGroupUpdateSchema
     ) -> TemplateGroupDetailSchema:
-        return await super().update_item(
+        template_group: TemplateGroup = await super().update_item(
             request, uid, data.model_dump(exclude_none=True, exclude_unset=True)
         )
+        template_group_documents.invalidate_id(template_group.id)
+        template_group_documents.invalidate(template_group.name)
+        return template_group
+
+    async def delete_item(self, request: Request, uid: UUID) -> TemplateGroup:
+        template_group: TemplateGroup = await super().delete_item(request, uid)
+        template_group_documents.invalidate(template_group.name)
+        return template_group
 
 
 router = TemplateRouter().router
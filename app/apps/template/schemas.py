@@ -47,6 +47,12 @@ class FieldSchema(BaseModel):
         return hash(self.name)
 
 
+class TemplatePreview(BaseModel):
+    url: str
+    width: int
+    height: int
+
+
 class TemplateCreateSchema(BaseModel):
     model: Literal["mwj", "psd"] = "mwj"
 
@@ -63,6 +69,7 @@ class TemplateCreateSchema(BaseModel):
     category: str = "general"
 
     license: Literal["free", "paid"] = "free"
+    ad_type: str | None = None
 
     colors: list[str] = []
     fonts: list[str] = []
@@ -84,6 +91,7 @@ class TemplateUpdateSchema(BaseModel):
     tags: list[str] | None = None
     category: str | None = None
     license: Literal["free", "paid"] | None = None
+    ad_type: str | None = None
     colors: list[str] | None = None
     fonts: list[str] | None = None
     fields: list[FieldSchema] | None = None
@@ -96,6 +104,7 @@ class TemplateSchema(TemplateCreateSchema, BaseEntitySchema):
     render_template_name: str | None = None
     fields: list[FieldSchema] = []
     assist_data: dict | None = None
+    previews: list[TemplatePreview] = []
 
 
 class TemplateGroupCreateSchema(BaseModel):
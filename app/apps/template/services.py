@@ -0,0 +1,54 @@
+import asyncio
+import logging
+
+from .cache import (
+    binding_plans,
+    compiled_templates,
+    template_documents,
+    template_group_documents,
+)
+from .models import Template, TemplateGroup
+
+
+async def _watch(model, cache):
+    collection = model.get_motor_collection()
+    async with collection.watch(full_document="updateLookup") as stream:
+        async for change in stream:
+            document = change.get("fullDocument")
+            if document is None:
+                # deletes and lookups that raced a delete only carry the _id
+                cache.invalidate_id(change.get("documentKey", {}).get("_id"))
+                if model is Template:
+                    compiled_templates.clear()
+                    binding_plans.clear()
+                continue
+            cache.invalidate_id(document["_id"])
+            cache.invalidate(document["name"])
+            if model is Template:
+                compiled_templates.invalidate(document["name"])
+                binding_plans.invalidate(document["name"])
+
+
+async def watch_template_changes(retry_delay: float = 5):
+    """Invalidate template caches when another worker writes to mongo.
+
+    Needs a replica set; when the stream errors it is reopened after
+    `retry_delay` seconds and the caches are cleared, since changes may have
+    been missed in between.
+    """
+
+    async def watch(model, cache):
+        while True:
+            try:
+                await _watch(model, cache)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.warning(f"{model.__name__} change stream failed: {e}")
+            cache.clear()
+            await asyncio.sleep(retry_delay)
+
+    await asyncio.gather(
+        watch(Template, template_documents),
+        watch(TemplateGroup, template_group_documents),
+    )
@@ -0,0 +1,11 @@
+"""End-to-end benchmarks of the render pipeline against local stand-ins.
+
+Run from the `app` directory:
+
+    pip install -r benchmarks/requirements.txt
+    python -m benchmarks --count 200 --concurrency 20
+    python -m benchmarks render --env RENDER_BULK_CONCURRENCY=8 --json
+
+These are not tests: they report latency percentiles, throughput and peak
+RSS so concurrency and cache settings can be compared on a fixed workload.
+"""
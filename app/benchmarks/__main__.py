@@ -0,0 +1,160 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+import uuid
+
+from . import scenarios
+from .fakes import BENCH_ENV, RENDERER_HOST, FakeUpstreams
+
+SCENARIOS = ["render", "bulk", "list_templates"]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks")
+    parser.add_argument("scenarios", nargs="*", help=f"any of {SCENARIOS}")
+    parser.add_argument("--count", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--templates", type=int, default=20)
+    parser.add_argument("--groups", type=int, default=50)
+    parser.add_argument("--group-size", type=int, default=5)
+    parser.add_argument("--assets", type=int, default=10)
+    parser.add_argument("--page-size", type=int, default=50)
+    parser.add_argument("--width", type=int, default=600)
+    parser.add_argument("--height", type=int, default=400)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--jitter", type=float, default=0.05)
+    parser.add_argument("--bulk-item-latency", type=float, default=0.02)
+    parser.add_argument("--upload-latency", type=float, default=0.02)
+    parser.add_argument("--renderers", type=int, default=1, help="renderer nodes")
+    parser.add_argument(
+        "--slow-node", type=float, default=0, help="extra latency of the first node"
+    )
+    parser.add_argument(
+        "--mongo-uri", help="use a real mongo instead of mongomock (a scratch db)"
+    )
+    parser.add_argument(
+        "--env",
+        action="append",
+        default=[],
+        metavar="KEY=VALUE",
+        help="override a setting, e.g. --env CPU_EXECUTOR=process",
+    )
+    parser.add_argument("--json", action="store_true", help="print JSON lines")
+    args = parser.parse_args()
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {sorted(unknown)}")
+    return args
+
+
+async def init_db(mongo_uri: str | None):
+    from apps.render.models import Render, RenderGroup
+    from apps.template.models import Template, TemplateGroup
+    from beanie import init_beanie
+
+    if mongo_uri:
+        from motor.motor_asyncio import AsyncIOMotorClient
+
+        client = AsyncIOMotorClient(mongo_uri)
+    else:
+        from mongomock_motor import AsyncMongoMockClient
+
+        client = AsyncMongoMockClient()
+
+    database = client[f"render_bench_{uuid.uuid4().hex[:8]}"]
+    await init_beanie(
+        database=database,
+        document_models=[Render, RenderGroup, Template, TemplateGroup],
+        # mongomock ignores partialFilterExpression, so the idempotency index
+        # would make every render without a key collide
+        skip_indexes=mongo_uri is None,
+    )
+    return client, database
+
+
+def report(results: list[scenarios.ScenarioResult], as_json: bool):
+    if as_json:
+        for result in results:
+            print(json.dumps(result.summary()))
+        return
+
+    columns = ["scenario", "requests", "errors", "concurrency"]
+    columns += ["p50_ms", "p95_ms", "p99_ms", "throughput_rps", "cumulative_rss_mb"]
+    print("  ".join(f"{column:>14}" for column in columns))
+    for result in results:
+        summary = result.summary()
+        print(
+            "  ".join(
+                (
+                    f"{summary[column]:>14.1f}"
+                    if isinstance(summary[column], float)
+                    else f"{summary[column]:>14}"
+                )
+                for column in columns
+            )
+        )
+        for error in sorted(set(result.errors))[:5]:
+            print(f"    error: {error}")
+
+
+async def main(args):
+    from server.clients import clients
+
+    upstreams = FakeUpstreams(
+        width=args.width,
+        height=args.height,
+        latency=args.latency,
+        jitter=args.jitter,
+        bulk_item_latency=args.bulk_item_latency,
+        upload_latency=args.upload_latency,
+        host_latency={RENDERER_HOST.format(0): args.slow_node},
+    )
+    clients.transport = upstreams.transport()
+
+    client, database = await init_db(args.mongo_uri)
+    await scenarios.seed(args.templates, args.groups, args.group_size)
+
+    results = []
+    options = {"count": args.count, "concurrency": args.concurrency}
+    try:
+        for name in args.scenarios or SCENARIOS:
+            if name == "render":
+                call = scenarios.render_call(args.templates, args.assets)
+            elif name == "bulk":
+                call = scenarios.bulk_call(args.groups, args.assets)
+            else:
+                import httpx
+                from server.server import app
+
+                api = httpx.AsyncClient(
+                    transport=httpx.ASGITransport(app=app), base_url="http://bench"
+                )
+                call = scenarios.list_templates_call(api, args.page_size)
+
+            results.append(
+                await scenarios.run(name, call, warmup=args.warmup, **options)
+            )
+    finally:
+        await clients.aclose()
+        if args.mongo_uri:
+            await client.drop_database(database.name)
+
+    report(results, args.json)
+    if not args.json:
+        print(f"upstream calls: {upstreams.calls}")
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    os.environ.update(BENCH_ENV)
+    os.environ["MWJ_RENDER_URLS"] = ",".join(
+        f"https://{RENDERER_HOST.format(i)}/render" for i in range(args.renderers)
+    )
+    for item in args.env:
+        key, _, value = item.partition("=")
+        os.environ[key] = value
+    logging.basicConfig(level=logging.ERROR)
+    asyncio.run(main(args))
@@ -0,0 +1,137 @@
+"""In-process stand-ins for the renderer, ufiles and template/asset hosts."""
+
+import asyncio
+import base64
+import json
+import random
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime
+from io import BytesIO
+
+import httpx
+from PIL import Image
+
+TEMPLATE_HOST = "templates.bench"
+ASSET_HOST = "assets.bench"
+RENDERER_HOST = "renderer-{}.bench"
+UFILES_HOST = "ufiles.bench"
+
+# settings are read at import time, so these are set before the app is imported
+BENCH_ENV = {
+    "MWJ_RENDER_URL": f"https://{RENDERER_HOST.format(0)}/render",
+    "RENDER_API_KEY": "bench",
+    "UFILES_URL": f"https://{UFILES_HOST}/v1/f",
+    "UFILES_API_KEY": "bench",
+    "USSO_URL": f"https://{UFILES_HOST}/usso",
+    "RENDER_JOB_MODE": "false",
+    "RENDER_WORKERS": "0",
+    "MWJ_CAPTURE_RATE": "0",
+    "TEMPLATE_CHANGE_STREAM": "false",
+}
+
+MWJ_TEMPLATE = """{
+    "width": 600,
+    "height": 400,
+    "layers": [
+        {"type": "text", "text": "{{ title }}", "font": "{{ font }}", "color": "{{ color }}"},
+        {"type": "text", "text": "{{ subtitle }}", "font": "{{ font1 }}", "color": "{{ color1 }}"},
+        {"type": "image", "src": "{{ image }}"},
+        {"type": "image", "src": "{{ logo }}"}
+    ]
+}"""
+
+
+def noise_png(width: int, height: int) -> bytes:
+    """A PNG that does not compress away, so encode costs look realistic."""
+    image = Image.frombytes(
+        "RGB", (width, height), random.randbytes(width * height * 3)
+    )
+    buffer = BytesIO()
+    image.save(buffer, format="PNG", compress_level=1)
+    return buffer.getvalue()
+
+
+@dataclass
+class FakeUpstreams:
+    """Answers every upstream call of the render pipeline.
+
+    The renderer sleeps `latency` (+ up to `jitter`) seconds per call, plus
+    `bulk_item_latency` per template on `/bulk`, and returns a
+    `width`x`height` image, as binary when asked for `image/*`.
+    """
+
+    width: int = 600
+    height: int = 400
+    latency: float = 0.2
+    jitter: float = 0.05
+    bulk_item_latency: float = 0.02
+    upload_latency: float = 0.02
+    # extra renderer latency per host, e.g. one slow node in the pool
+    host_latency: dict[str, float] = field(default_factory=dict)
+    calls: dict[str, int] = field(default_factory=dict)
+
+    def __post_init__(self):
+        self.image = noise_png(self.width, self.height)
+        self.image_base64 = base64.b64encode(self.image).decode()
+        self.asset = noise_png(256, 256)
+
+    def transport(self) -> httpx.MockTransport:
+        return httpx.MockTransport(self.handle)
+
+    def _count(self, name: str):
+        self.calls[name] = self.calls.get(name, 0) + 1
+
+    async def _sleep(self, seconds: float):
+        await asyncio.sleep(seconds + random.uniform(0, self.jitter))
+
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        host = request.url.host
+        if host == TEMPLATE_HOST:
+            self._count("templates")
+            return httpx.Response(200, text=MWJ_TEMPLATE)
+        if host == ASSET_HOST:
+            self._count("assets")
+            return httpx.Response(200, content=self.asset, headers={"ETag": '"bench"'})
+        if host.startswith("renderer-"):
+            return await self.render(request)
+        if host == UFILES_HOST:
+            return await self.upload(request)
+        return httpx.Response(404)
+
+    async def render(self, request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content)
+        latency = self.latency + self.host_latency.get(request.url.host, 0)
+        if request.url.path.endswith("/bulk"):
+            self._count("render_bulk")
+            count = len(body["templates"])
+            await self._sleep(latency + self.bulk_item_latency * count)
+            return httpx.Response(200, json={"results": [self.image_base64] * count})
+
+        self._count(f"render:{request.url.host}")
+        await self._sleep(latency)
+        if "image/" in request.headers.get("accept", ""):
+            return httpx.Response(
+                200, content=self.image, headers={"content-type": "image/png"}
+            )
+        return httpx.Response(200, json={"result": self.image_base64})
+
+    async def upload(self, request: httpx.Request) -> httpx.Response:
+        self._count("upload")
+        await request.aread()
+        await self._sleep(self.upload_latency)
+        uid = uuid.uuid4()
+        now = datetime.now().isoformat()
+        return httpx.Response(
+            200,
+            json={
+                "uid": str(uid),
+                "created_at": now,
+                "updated_at": now,
+                "is_deleted": False,
+                "user_id": str(uuid.uuid4()),
+                "business_name": "bench",
+                "filename": f"{uid}.jpg",
+                "url": f"https://{UFILES_HOST}/{uid}.jpg",
+            },
+        )
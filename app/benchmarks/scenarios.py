@@ -0,0 +1,188 @@
+import asyncio
+import math
+import resource
+import sys
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable
+
+from .fakes import ASSET_HOST, TEMPLATE_HOST
+
+
+def peak_rss() -> int:
+    """Peak resident set size of this process so far in bytes.
+
+    The peak never goes down, so with several scenarios in one run each
+    reports the highest RSS of itself and every scenario before it.
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def percentile(values: list[float], p: float) -> float:
+    if not values:
+        return math.nan
+    values = sorted(values)
+    return values[max(0, math.ceil(p / 100 * len(values)) - 1)]
+
+
+@dataclass
+class ScenarioResult:
+    name: str
+    concurrency: int
+    wall: float = 0
+    latencies: list[float] = field(default_factory=list)
+    errors: list[str] = field(default_factory=list)
+    peak_rss: int = 0
+
+    @property
+    def throughput(self) -> float:
+        return len(self.latencies) / self.wall if self.wall else 0
+
+    def summary(self) -> dict:
+        return {
+            "scenario": self.name,
+            "requests": len(self.latencies),
+            "errors": len(self.errors),
+            "concurrency": self.concurrency,
+            "p50_ms": percentile(self.latencies, 50) * 1000,
+            "p95_ms": percentile(self.latencies, 95) * 1000,
+            "p99_ms": percentile(self.latencies, 99) * 1000,
+            "throughput_rps": self.throughput,
+            "cumulative_rss_mb": self.peak_rss / 2**20,
+        }
+
+
+async def run(
+    name: str,
+    call: Callable[[int], Awaitable],
+    count: int,
+    concurrency: int,
+    warmup: int = 0,
+) -> ScenarioResult:
+    """Await `call(i)` `count` times, at most `concurrency` at once.
+
+    The first `warmup` calls run before timing starts and are not reported.
+    """
+    for i in range(warmup):
+        await call(-1 - i)
+
+    result = ScenarioResult(name=name, concurrency=concurrency)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def timed(i: int):
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                await call(i)
+            except Exception as e:
+                result.errors.append(f"{type(e).__name__}: {e}")
+                return
+            result.latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*[timed(i) for i in range(count)])
+    result.wall = time.perf_counter() - start
+    result.peak_rss = peak_rss()
+    return result
+
+
+async def seed(templates: int, groups: int, group_size: int):
+    from apps.template.models import Template, TemplateGroup
+    from apps.template.schemas import FieldSchema, FieldType
+
+    await Template.insert_many(
+        [
+            Template(
+                name=f"bench-{i}",
+                url=f"https://{TEMPLATE_HOST}/bench-{i}.j2",
+                thumbnail=f"https://{ASSET_HOST}/thumbnail-{i}.png",
+                fonts=["Vazirmatn", "Roboto"],
+                colors=["#000000", "#ffffff"],
+                fields=[
+                    FieldSchema(name="title", label="Title", default="Title"),
+                    FieldSchema(name="subtitle", label="Subtitle"),
+                    FieldSchema(name="image", label="Image", type=FieldType.image),
+                ],
+            )
+            for i in range(templates)
+        ]
+    )
+    await TemplateGroup.insert_many(
+        [
+            TemplateGroup(
+                name=f"bench-group-{i}",
+                thumbnail=f"https://{ASSET_HOST}/thumbnail-{i}.png",
+                template_names=[
+                    f"bench-{(i * group_size + j) % templates}"
+                    for j in range(group_size)
+                ],
+            )
+            for i in range(groups)
+        ]
+    )
+
+
+def render_data(i: int, assets: int) -> dict:
+    """Unique texts per call so the render result cache does not hit."""
+    return {
+        "texts": [f"Title {i}", f"Subtitle {uuid.uuid4().hex[:8]}"],
+        "images": {"image": f"https://{ASSET_HOST}/image-{i % assets}.png"},
+        "logo": f"https://{ASSET_HOST}/logo.png",
+        "colors": ["#123456"],
+        "user_id": uuid.uuid4(),
+    }
+
+
+def render_call(templates: int, assets: int):
+    from apps.render.models import Render
+    from apps.render.schemas import RenderStatus
+    from apps.render.services import run_render
+
+    async def call(i: int):
+        render = Render(
+            template_name=f"bench-{i % templates}",
+            status=RenderStatus.processing,
+            **render_data(i, assets),
+        )
+        await render.insert()
+        await run_render(render)
+
+    return call
+
+
+def bulk_call(groups: int, assets: int):
+    from apps.render.models import RenderGroup
+    from apps.render.schemas import RenderStatus
+    from apps.render.services import run_render
+
+    async def call(i: int):
+        render_group = RenderGroup(
+            group_name=f"bench-group-{i % groups}",
+            status=RenderStatus.processing,
+            **render_data(i, assets),
+        )
+        await render_group.insert()
+        render_group = await run_render(render_group)
+        if render_group.errors:
+            raise RuntimeError(next(iter(render_group.errors.values())))
+
+    return call
+
+
+def list_templates_call(client, page_size: int):
+    """Page through every template with a projected, cursor-paged listing."""
+    from server.config import Settings
+
+    async def call(i: int):
+        params = {"limit": page_size, "fields": "name,thumbnail"}
+        while True:
+            r = await client.get(f"{Settings.base_path}/templates/", params=params)
+            r.raise_for_status()
+            cursor = r.json().get("next_cursor")
+            if not cursor:
+                break
+            params["cursor"] = cursor
+
+    return call
@@ -0,0 +1,40 @@
+"""Production launcher: `gunicorn -c gunicorn.conf.py app:app`.
+
+Every setting can be overridden from the environment. Workers import the app
+after the fork, so each one opens its own Mongo and HTTP connections and warms
+its caches in the app lifespan. Send HUP for a graceful reload of all workers.
+"""
+
+import logging
+import multiprocessing
+import os
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+# picks uvloop and httptools automatically when uvicorn[standard] is installed
+worker_class = "uvicorn.workers.UvicornWorker"
+
+# recycle workers to bound memory growth from caches and fragmentation
+max_requests = int(os.getenv("MAX_REQUESTS", 5000))
+max_requests_jitter = int(os.getenv("MAX_REQUESTS_JITTER", 500))
+
+timeout = int(os.getenv("WORKER_TIMEOUT", 120))
+graceful_timeout = int(os.getenv("GRACEFUL_TIMEOUT", 60))
+keepalive = int(os.getenv("KEEPALIVE", 5))
+
+accesslog = os.getenv("ACCESS_LOG") or None
+loglevel = os.getenv("LOG_LEVEL", "info")
+
+
+def post_worker_init(worker):
+    logging.info(f"Worker {worker.pid} ready")
+
+
+def child_exit(server, worker):
+    # drop the dead worker's live gauges from the multiprocess metrics
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        try:
+            from prometheus_client import multiprocess
+        except ImportError:
+            return
+        multiprocess.mark_process_dead(worker.pid)
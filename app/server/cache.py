@@ -0,0 +1,81 @@
+"""In-process cache primitives."""
+
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable
+
+
+class LRUCache:
+    """A least-recently-used mapping bounded by entry count and/or total size.
+
+    `sizeof` measures a value for the `max_bytes` budget; without it only the
+    entry count is bounded. With `ttl`, entries expire that many seconds
+    after they were set.
+    """
+
+    def __init__(
+        self,
+        maxsize: int | None = 128,
+        *,
+        max_bytes: int | None = None,
+        sizeof: Callable[[Any], int] | None = None,
+        ttl: float | None = None,
+    ):
+        self.maxsize = maxsize
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof or (lambda value: 0)
+        self.ttl = ttl
+        self.nbytes = 0
+        self._items: OrderedDict[Hashable, Any] = OrderedDict()
+        self._expires: dict[Hashable, float] = {}
+
+    def __len__(self):
+        return len(self._items)
+
+    def __contains__(self, key: Hashable):
+        return key in self._items
+
+    def _over_budget(self) -> bool:
+        if self.maxsize is not None and len(self._items) > self.maxsize:
+            return True
+        return self.max_bytes is not None and self.nbytes > self.max_bytes
+
+    def get(self, key: Hashable, default=None):
+        if key not in self._items:
+            return default
+        if key in self._expires and self._expires[key] <= time.monotonic():
+            self.pop(key)
+            return default
+        self._items.move_to_end(key)
+        return self._items[key]
+
+    def set(self, key: Hashable, value: Any):
+        self.pop(key)
+        self._items[key] = value
+        self.nbytes += self.sizeof(value)
+        if self.ttl is not None:
+            self._expires[key] = time.monotonic() + self.ttl
+        while self._items and self._over_budget():
+            self.pop(next(iter(self._items)))
+
+    def pop(self, key: Hashable, default=None):
+        if key not in self._items:
+            return default
+        value = self._items.pop(key)
+        self._expires.pop(key, None)
+        self.nbytes -= self.sizeof(value)
+        return value
+
+    def items(self) -> list[tuple[Hashable, Any]]:
+        return list(self._items.items())
+
+    def pop_matching(self, predicate: Callable[[Hashable], bool]) -> int:
+        keys = [key for key in self._items if predicate(key)]
+        for key in keys:
+            self.pop(key)
+        return len(keys)
+
+    def clear(self):
+        self._items.clear()
+        self._expires.clear()
+        self.nbytes = 0
@@ -0,0 +1,68 @@
+"""Process-wide pooled HTTP clients for the upstream services."""
+
+import httpx
+
+from .config import Settings
+
+
+class ClientRegistry:
+    """Lazily opened keep-alive clients, one pool per upstream.
+
+    All renderer nodes share one client, so its pool limit bounds connections
+    to the renderer pool as a whole. Setting `transport`
+    routes every client through it instead, e.g. to local stand-ins.
+    """
+
+    def __init__(self, transport: httpx.AsyncBaseTransport | None = None):
+        self.transport = transport
+        self._clients: dict[str, httpx.AsyncClient] = {}
+
+    @staticmethod
+    def _timeout() -> httpx.Timeout:
+        return httpx.Timeout(
+            Settings.HTTP_TIMEOUT, connect=Settings.HTTP_CONNECT_TIMEOUT
+        )
+
+    def _create(self, max_connections: int) -> httpx.AsyncClient:
+        return httpx.AsyncClient(
+            transport=self.transport,
+            http2=Settings.HTTP2,
+            timeout=self._timeout(),
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+                keepalive_expiry=Settings.HTTP_KEEPALIVE_EXPIRY,
+            ),
+            follow_redirects=True,
+        )
+
+    def get(self, name: str, max_connections: int | None = None) -> httpx.AsyncClient:
+        client = self._clients.get(name)
+        if client is None or client.is_closed:
+            client = self._create(max_connections or Settings.HTTP_MAX_CONNECTIONS)
+            self._clients[name] = client
+        return client
+
+    @property
+    def renderer(self) -> httpx.AsyncClient:
+        return self.get("renderer", Settings.RENDER_MAX_CONNECTIONS)
+
+    @property
+    def assets(self) -> httpx.AsyncClient:
+        return self.get("assets")
+
+    @property
+    def templates(self) -> httpx.AsyncClient:
+        return self.get("templates")
+
+    @property
+    def ufiles(self) -> httpx.AsyncClient:
+        return self.get("ufiles")
+
+    async def aclose(self):
+        for client in self._clients.values():
+            await client.aclose()
+        self._clients.clear()
+
+
+clients = ClientRegistry()
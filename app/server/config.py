@@ -23,4 +23,157 @@ class Settings(config.Settings):
     USSO_BASE_URL: str = os.getenv("USSO_URL")
 
     MWJ_RENDER_URL: str = os.getenv("MWJ_RENDER_URL", "https://render.pixiee.io/render")
+    # comma separated renderer nodes to balance across; MWJ_RENDER_URL if empty
+    MWJ_RENDER_URLS: str = os.getenv("MWJ_RENDER_URLS", "")
     RENDER_API_KEY: str = os.getenv("RENDER_API_KEY")
+
+    TEMPLATE_CACHE_SIZE: int = int(os.getenv("TEMPLATE_CACHE_SIZE", 256))
+    # seconds before a compiled template's MWJ url is revalidated, since its
+    # body can change without the template document changing
+    TEMPLATE_REVALIDATE_AFTER: float = float(os.getenv("TEMPLATE_REVALIDATE_AFTER", 60))
+
+    # HTTP/2 needs the optional `h2` package (`pip install httpx[http2]`)
+    HTTP2: bool = os.getenv("HTTP2", "false").lower() == "true"
+    HTTP_TIMEOUT: float = float(os.getenv("HTTP_TIMEOUT", 60))
+    HTTP_CONNECT_TIMEOUT: float = float(os.getenv("HTTP_CONNECT_TIMEOUT", 5))
+    HTTP_KEEPALIVE_EXPIRY: float = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", 30))
+    HTTP_MAX_CONNECTIONS: int = int(os.getenv("HTTP_MAX_CONNECTIONS", 50))
+    RENDER_MAX_CONNECTIONS: int = int(os.getenv("RENDER_MAX_CONNECTIONS", 20))
+
+    RENDER_JOB_MODE: bool = os.getenv("RENDER_JOB_MODE", "false").lower() == "true"
+    # "memory" keeps jobs in the api process, "redis" shares them with `worker.py`
+    RENDER_QUEUE_BACKEND: str = os.getenv("RENDER_QUEUE_BACKEND", "memory")
+    RENDER_WORKERS: int = int(os.getenv("RENDER_WORKERS", 4))
+    # seconds running jobs get to finish on shutdown before they are requeued
+    RENDER_DRAIN_TIMEOUT: float = float(os.getenv("RENDER_DRAIN_TIMEOUT", 30))
+    # seconds after which a pending or processing render is taken as lost by
+    # a dead worker and requeued, 0 disables it; keep it above the longest render
+    RENDER_JOB_STALE_AFTER: float = float(os.getenv("RENDER_JOB_STALE_AFTER", 900))
+
+    # set to false if the renderer does not expose the `/bulk` route
+    RENDER_BULK_ENDPOINT: bool = (
+        os.getenv("RENDER_BULK_ENDPOINT", "true").lower() == "true"
+    )
+    RENDER_BULK_CONCURRENCY: int = int(os.getenv("RENDER_BULK_CONCURRENCY", 4))
+
+    ASSET_CACHE_MAX_BYTES: int = int(os.getenv("ASSET_CACHE_MAX_BYTES", 256 * 2**20))
+    # optional on-disk tier, disabled when empty
+    ASSET_CACHE_DIR: str = os.getenv("ASSET_CACHE_DIR", "")
+    # size the on-disk tier is trimmed to, 0 leaves it unbounded
+    ASSET_CACHE_DIR_MAX_BYTES: int = int(
+        os.getenv("ASSET_CACHE_DIR_MAX_BYTES", 2 * 2**30)
+    )
+    # seconds before a cached asset is revalidated with ETag/Last-Modified
+    ASSET_CACHE_MAX_AGE: float = float(os.getenv("ASSET_CACHE_MAX_AGE", 3600))
+    # JPEG quality assets are re-encoded at before they are sent to the renderer
+    ASSET_JPEG_QUALITY: int = int(os.getenv("ASSET_JPEG_QUALITY", 75))
+    # inline (base64) images in render requests: "upload" moves dict-form
+    # images and logos to ufiles and stores the url (list-form images are
+    # rendered as sent, so they are kept), "reject" refuses them, "keep"
+    # stores them as sent; the size limit applies in every mode
+    RENDER_INLINE_IMAGES: str = os.getenv("RENDER_INLINE_IMAGES", "upload")
+    RENDER_INLINE_IMAGE_MAX_BYTES: int = int(
+        os.getenv("RENDER_INLINE_IMAGE_MAX_BYTES", 5 * 2**20)
+    )
+
+    # seconds a finished render is reused for identical input, 0 disables it
+    RENDER_CACHE_TTL: int = int(os.getenv("RENDER_CACHE_TTL", 24 * 3600))
+    # "owner" reuses only the caller's renders, "global" reuses anyone's
+    RENDER_CACHE_SCOPE: str = os.getenv("RENDER_CACHE_SCOPE", "owner")
+
+    # renderer output already in this format is uploaded without re-encoding
+    RENDER_OUTPUT_FORMAT: str = os.getenv("RENDER_OUTPUT_FORMAT", "JPEG")
+    RENDER_OUTPUT_QUALITY: int = int(os.getenv("RENDER_OUTPUT_QUALITY", 90))
+    # limits on the sizes and formats one render may request
+    RENDER_OUTPUTS_MAX: int = int(os.getenv("RENDER_OUTPUTS_MAX", 10))
+    RENDER_OUTPUT_MAX_SIZE: int = int(os.getenv("RENDER_OUTPUT_MAX_SIZE", 4096))
+    # ask the renderer for raw image bytes instead of base64 json
+    RENDER_ACCEPT_BINARY: bool = (
+        os.getenv("RENDER_ACCEPT_BINARY", "false").lower() == "true"
+    )
+
+    # "thread" or "process" pool for image encoding and large json work
+    CPU_EXECUTOR: str = os.getenv("CPU_EXECUTOR", "thread")
+    CPU_EXECUTOR_WORKERS: int = int(
+        os.getenv("CPU_EXECUTOR_WORKERS", min(32, (os.cpu_count() or 1) + 4))
+    )
+
+    # share of renders whose MWJ payload is written to MWJ_CAPTURE_DIR, 0 disables
+    MWJ_CAPTURE_RATE: float = float(os.getenv("MWJ_CAPTURE_RATE", 0))
+    MWJ_CAPTURE_DIR: str = os.getenv("MWJ_CAPTURE_DIR", "logs/mwj")
+    MWJ_CAPTURE_MAX_BYTES: int = int(os.getenv("MWJ_CAPTURE_MAX_BYTES", 5 * 2**20))
+    MWJ_CAPTURE_MAX_FILES: int = int(os.getenv("MWJ_CAPTURE_MAX_FILES", 100))
+
+    # templates of recent renders compiled at startup by each worker
+    WARMUP_TEMPLATES: int = int(os.getenv("WARMUP_TEMPLATES", 50))
+
+    TEMPLATE_METADATA_CACHE_SIZE: int = int(
+        os.getenv("TEMPLATE_METADATA_CACHE_SIZE", 1024)
+    )
+    # safety net for other workers' writes when change streams are off
+    TEMPLATE_METADATA_CACHE_TTL: float = float(
+        os.getenv("TEMPLATE_METADATA_CACHE_TTL", 300)
+    )
+    # invalidate template caches from mongo change streams (needs a replica set)
+    TEMPLATE_CHANGE_STREAM: bool = (
+        os.getenv("TEMPLATE_CHANGE_STREAM", "false").lower() == "true"
+    )
+    # render previews from field defaults when a template is created or updated
+    TEMPLATE_PREVIEWS: bool = os.getenv("TEMPLATE_PREVIEWS", "true").lower() == "true"
+    # comma separated preview widths
+    TEMPLATE_PREVIEW_SIZES: str = os.getenv("TEMPLATE_PREVIEW_SIZES", "160,320,640")
+    TEMPLATE_PREVIEW_FORMAT: str = os.getenv("TEMPLATE_PREVIEW_FORMAT", "WEBP")
+    TEMPLATE_PREVIEW_QUALITY: int = int(os.getenv("TEMPLATE_PREVIEW_QUALITY", 75))
+
+    # identical render requests without an Idempotency-Key are coalesced within
+    # this many seconds, 0 disables it; explicit keys are honoured for the TTL
+    RENDER_IDEMPOTENCY_WINDOW: float = float(os.getenv("RENDER_IDEMPOTENCY_WINDOW", 60))
+    RENDER_IDEMPOTENCY_TTL: float = float(
+        os.getenv("RENDER_IDEMPOTENCY_TTL", 24 * 3600)
+    )
+    # how long a duplicate request waits for a render running in another worker
+    RENDER_IDEMPOTENCY_WAIT: float = float(os.getenv("RENDER_IDEMPOTENCY_WAIT", 300))
+
+    # variants sent to the renderer's /bulk route per call
+    RENDER_VARIANTS_BATCH_SIZE: int = int(os.getenv("RENDER_VARIANTS_BATCH_SIZE", 16))
+    RENDER_VARIANTS_MAX: int = int(os.getenv("RENDER_VARIANTS_MAX", 1000))
+
+    # "memory" only reaches subscribers in the same process as the render
+    RENDER_EVENTS_BACKEND: str = os.getenv("RENDER_EVENTS_BACKEND", "memory")
+    RENDER_EVENTS_KEEPALIVE: float = float(os.getenv("RENDER_EVENTS_KEEPALIVE", 15))
+
+    # emit a span per render stage (needs opentelemetry-api and a configured SDK)
+    OTEL_SPANS: bool = os.getenv("OTEL_SPANS", "false").lower() == "true"
+
+    # adaptive concurrency (AIMD) towards the renderer and ufiles; the upper
+    # bounds are RENDER_MAX_CONNECTIONS and HTTP_MAX_CONNECTIONS
+    UPSTREAM_MIN_CONCURRENCY: int = int(os.getenv("UPSTREAM_MIN_CONCURRENCY", 2))
+    # seconds; slower calls count as overload, 0 only reacts to errors
+    UPSTREAM_LATENCY_TARGET: float = float(os.getenv("UPSTREAM_LATENCY_TARGET", 0))
+    UPSTREAM_QUEUE_TIMEOUT: float = float(os.getenv("UPSTREAM_QUEUE_TIMEOUT", 30))
+    BREAKER_FAILURE_THRESHOLD: int = int(os.getenv("BREAKER_FAILURE_THRESHOLD", 5))
+    BREAKER_RESET_TIMEOUT: float = float(os.getenv("BREAKER_RESET_TIMEOUT", 30))
+    RETRY_ATTEMPTS: int = int(os.getenv("RETRY_ATTEMPTS", 3))
+    RETRY_BASE_DELAY: float = float(os.getenv("RETRY_BASE_DELAY", 0.5))
+    RETRY_MAX_DELAY: float = float(os.getenv("RETRY_MAX_DELAY", 8))
+
+    # renderer nodes are marked down after consecutive failures for a cooldown,
+    # and, when RENDER_HEALTH_PATH is set, probed every RENDER_HEALTH_INTERVAL
+    # at that path relative to each node url, as `/bulk` is
+    RENDER_BACKEND_MAX_FAILURES: int = int(os.getenv("RENDER_BACKEND_MAX_FAILURES", 3))
+    RENDER_BACKEND_COOLDOWN: float = float(os.getenv("RENDER_BACKEND_COOLDOWN", 30))
+    RENDER_HEALTH_PATH: str = os.getenv("RENDER_HEALTH_PATH", "")
+    RENDER_HEALTH_INTERVAL: float = float(os.getenv("RENDER_HEALTH_INTERVAL", 10))
+    # send a duplicate render to a second node once the pool's p95 has passed
+    RENDER_HEDGE: bool = os.getenv("RENDER_HEDGE", "false").lower() == "true"
+    RENDER_HEDGE_PERCENTILE: float = float(os.getenv("RENDER_HEDGE_PERCENTILE", 95))
+
+    # local Pillow compositing of simple templates: "off", "fallback" when the
+    # remote renderer fails, or "prefer" to skip the remote renderer for them
+    RENDER_LOCAL: str = os.getenv("RENDER_LOCAL", "off")
+    # .ttf/.otf files the local renderer may use, matched by file name
+    RENDER_FONTS_DIR: str = os.getenv("RENDER_FONTS_DIR", "fonts")
+    RENDER_LOCAL_EXECUTOR: str = os.getenv("RENDER_LOCAL_EXECUTOR", "process")
+    RENDER_LOCAL_WORKERS: int = int(
+        os.getenv("RENDER_LOCAL_WORKERS", os.cpu_count() or 1)
+    )
@@ -0,0 +1,77 @@
+"""Executors for CPU-bound work that must not block the event loop."""
+
+import asyncio
+import functools
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable
+
+from .config import Settings
+
+
+class CPUExecutor:
+    """Runs blocking calls off the event loop and tracks queue depth.
+
+    `run` uses a process pool when `kind` is "process", which needs picklable
+    callables and arguments; `run_thread` always uses the thread pool, for
+    work on objects that cannot cross process boundaries (e.g. jinja templates)
+    or for blocking file I/O.
+    """
+
+    def __init__(self, kind: str = "thread", max_workers: int = 4):
+        self.kind = kind
+        self.max_workers = max_workers
+        self._threads: ThreadPoolExecutor | None = None
+        self._processes: ProcessPoolExecutor | None = None
+        self.in_flight = {"thread": 0, "process": 0}
+        self.completed = {"thread": 0, "process": 0}
+
+    def _thread_pool(self) -> ThreadPoolExecutor:
+        if self._threads is None:
+            self._threads = ThreadPoolExecutor(
+                self.max_workers, thread_name_prefix="cpu"
+            )
+        return self._threads
+
+    def _process_pool(self) -> ProcessPoolExecutor:
+        if self._processes is None:
+            self._processes = ProcessPoolExecutor(self.max_workers)
+        return self._processes
+
+    async def _submit(self, pool: str, executor: Executor, func: Callable, *args):
+        self.in_flight[pool] += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(executor, func, *args)
+        finally:
+            self.in_flight[pool] -= 1
+            self.completed[pool] += 1
+
+    async def run(self, func: Callable, *args, **kwargs) -> Any:
+        func = functools.partial(func, *args, **kwargs)
+        if self.kind == "process":
+            return await self._submit("process", self._process_pool(), func)
+        return await self._submit("thread", self._thread_pool(), func)
+
+    async def run_thread(self, func: Callable, *args, **kwargs) -> Any:
+        func = functools.partial(func, *args, **kwargs)
+        return await self._submit("thread", self._thread_pool(), func)
+
+    def stats(self) -> dict:
+        return {
+            pool: {
+                "workers": self.max_workers,
+                "in_flight": self.in_flight[pool],
+                "queue_depth": max(0, self.in_flight[pool] - self.max_workers),
+                "completed": self.completed[pool],
+            }
+            for pool in ("thread", "process")
+        }
+
+    def shutdown(self):
+        for executor in (self._threads, self._processes):
+            if executor is not None:
+                executor.shutdown(wait=False, cancel_futures=True)
+        self._threads = self._processes = None
+
+
+cpu_executor = CPUExecutor(Settings.CPU_EXECUTOR, Settings.CPU_EXECUTOR_WORKERS)
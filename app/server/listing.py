@@ -0,0 +1,149 @@
+"""Projected, keyset-paginated list queries for the list routes.
+
+`fields=uid,status` loads and returns only those fields (plus `uid` and
+`created_at`). Pages are ordered by `created_at` and `_id`, newest first;
+each page has a `next_cursor` while more items remain, and passing it back as
+`cursor=` continues after the last item without skipping over `offset`
+documents. Cursor pages do not count `total`.
+"""
+
+import base64
+import functools
+import json
+from datetime import datetime
+from typing import Generic, Optional, TypeVar
+
+from beanie import Document, PydanticObjectId
+from bson.errors import InvalidId
+from fastapi_mongo_base.core.exceptions import BaseHTTPException
+from fastapi_mongo_base.routes import AbstractBaseRouter
+from fastapi_mongo_base.schemas import PaginatedResponse
+from pydantic import BaseModel, Field, create_model
+from pymongo import DESCENDING
+
+T = TypeVar("T")
+
+# returned with every projection so items can be identified and paged
+KEY_FIELDS = frozenset({"uid", "created_at"})
+
+
+class ListResponse(PaginatedResponse[T], Generic[T]):
+    total: int | None = None
+    next_cursor: str | None = None
+
+
+@functools.lru_cache(maxsize=None)
+def partial_schema(schema: type[BaseModel]) -> type[BaseModel]:
+    """`schema` with every field optional, for projected list items."""
+    return create_model(
+        f"Partial{schema.__name__}",
+        **{
+            name: (Optional[field.annotation], None)
+            for name, field in schema.model_fields.items()
+        },
+    )
+
+
+@functools.lru_cache(maxsize=256)
+def projection_model(
+    schema: type[BaseModel], fields: frozenset[str]
+) -> type[BaseModel]:
+    return create_model(
+        f"{schema.__name__}Projection",
+        id=(Optional[PydanticObjectId], Field(None, alias="_id")),
+        **{
+            name: (Optional[schema.model_fields[name].annotation], None)
+            for name in sorted(fields)
+        },
+    )
+
+
+def parse_fields(fields: str | None, schema: type[BaseModel]) -> frozenset | None:
+    if not fields:
+        return None
+    names = frozenset(name.strip() for name in fields.split(",") if name.strip())
+    unknown = names - schema.model_fields.keys()
+    if unknown:
+        raise BaseHTTPException(
+            status_code=400,
+            error="invalid_fields",
+            message=f"Unknown fields: {', '.join(sorted(unknown))}",
+        )
+    return names | KEY_FIELDS
+
+
+def encode_cursor(item) -> str:
+    text = json.dumps([item.created_at.isoformat(), str(item.id)])
+    return base64.urlsafe_b64encode(text.encode()).decode().rstrip("=")
+
+
+def cursor_condition(cursor: str) -> dict:
+    try:
+        text = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, id = json.loads(text)
+        created_at = datetime.fromisoformat(created_at)
+        id = PydanticObjectId(id)
+    except (ValueError, TypeError, InvalidId):
+        raise BaseHTTPException(
+            status_code=400, error="invalid_cursor", message="Invalid cursor"
+        )
+    return {
+        "$or": [
+            {"created_at": {"$lt": created_at}},
+            {"created_at": created_at, "_id": {"$lt": id}},
+        ]
+    }
+
+
+async def list_page(
+    model: type[Document],
+    schema: type[BaseModel],
+    conditions: list[dict],
+    offset: int = 0,
+    limit: int = 10,
+    cursor: str | None = None,
+    fields: frozenset | None = None,
+) -> ListResponse:
+    """Load one page of `model` matching `conditions` as `schema` items."""
+    query = {"$and": conditions + ([cursor_condition(cursor)] if cursor else [])}
+    find = (
+        model.find(query, projection_model=projection_model(schema, fields))
+        if fields
+        else model.find(query)
+    )
+    # one extra item tells whether there is a next page
+    items = (
+        await find.sort([("created_at", DESCENDING), ("_id", DESCENDING)])
+        .skip(0 if cursor else offset)
+        .limit(limit + 1)
+        .to_list()
+    )
+    next_cursor = encode_cursor(items[limit - 1]) if len(items) > limit else None
+    items = items[:limit]
+
+    partial = partial_schema(schema)
+    return ListResponse(
+        items=[
+            partial(**item.model_dump(include=fields, exclude_unset=bool(fields)))
+            for item in items
+        ],
+        total=None if cursor else await model.find({"$and": conditions}).count(),
+        offset=0 if cursor else offset,
+        limit=limit,
+        next_cursor=next_cursor,
+    )
+
+
+def add_list_route(base_router: AbstractBaseRouter):
+    """Register `list_items` so projected items omit the fields left out."""
+    base_router.list_response_schema = ListResponse[
+        partial_schema(base_router.list_item_schema)
+    ]
+    base_router.router.add_api_route(
+        "/",
+        base_router.list_items,
+        methods=["GET"],
+        response_model=base_router.list_response_schema,
+        response_model_exclude_unset=True,
+        status_code=200,
+    )
@@ -0,0 +1,118 @@
+"""Render pipeline metrics, exported to Prometheus and optionally as spans.
+
+`prometheus_client` and `opentelemetry-api` are optional: without the first
+`timed` records nothing and `/metrics` is not mounted, and spans are only
+emitted when the second is installed and `OTEL_SPANS` is set. Under gunicorn,
+set `PROMETHEUS_MULTIPROC_DIR` so every worker's samples are aggregated.
+"""
+
+import os
+import time
+from contextlib import contextmanager
+
+import fastapi
+
+from . import resilience
+from .config import Settings
+from .executor import cpu_executor
+
+try:
+    import prometheus_client
+    from prometheus_client import multiprocess
+except ImportError:
+    prometheus_client = None
+
+try:
+    from opentelemetry import trace
+except ImportError:
+    trace = None
+
+STAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+if prometheus_client is not None:
+    STAGE_SECONDS = prometheus_client.Histogram(
+        "render_stage_seconds",
+        "Time spent in each render pipeline stage",
+        ["stage", "template_name", "outcome"],
+        buckets=STAGE_BUCKETS,
+    )
+    EXECUTOR_IN_FLIGHT = prometheus_client.Gauge(
+        "cpu_executor_in_flight",
+        "Calls running or queued on the CPU executor",
+        ["pool"],
+        multiprocess_mode="livesum",
+    )
+    EXECUTOR_QUEUE_DEPTH = prometheus_client.Gauge(
+        "cpu_executor_queue_depth",
+        "Calls waiting for a CPU executor worker",
+        ["pool"],
+        multiprocess_mode="livesum",
+    )
+    UPSTREAM_STATE = prometheus_client.Gauge(
+        "upstream_state",
+        "Adaptive limit, in-flight, shed and breaker counts per upstream",
+        ["upstream", "metric"],
+        multiprocess_mode="livesum",
+    )
+
+tracer = (
+    trace.get_tracer("render-service")
+    if trace is not None and Settings.OTEL_SPANS
+    else None
+)
+
+
+@contextmanager
+def timed(stage: str, template_name: str | None = None):
+    """Time a pipeline stage, labelled with the template and its outcome."""
+    span = (
+        tracer.start_as_current_span(
+            f"render.{stage}", attributes={"template_name": template_name or ""}
+        )
+        if tracer is not None
+        else None
+    )
+    outcome = "ok"
+    start = time.perf_counter()
+    try:
+        if span is None:
+            yield
+        else:
+            with span:
+                yield
+    except BaseException:
+        outcome = "error"
+        raise
+    finally:
+        if prometheus_client is not None:
+            STAGE_SECONDS.labels(stage, template_name or "", outcome).observe(
+                time.perf_counter() - start
+            )
+
+
+def metrics() -> fastapi.Response:
+    for pool, stats in cpu_executor.stats().items():
+        EXECUTOR_IN_FLIGHT.labels(pool).set(stats["in_flight"])
+        EXECUTOR_QUEUE_DEPTH.labels(pool).set(stats["queue_depth"])
+    for name, stats in resilience.stats().items():
+        breaker = stats["breaker"]
+        values = stats["limiter"] | {
+            "circuit_open": int(breaker["state"] != "closed"),
+            "rejected": breaker["rejected"],
+        }
+        for metric, value in values.items():
+            UPSTREAM_STATE.labels(name, metric).set(value)
+
+    registry = prometheus_client.REGISTRY
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = prometheus_client.CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    return fastapi.Response(
+        prometheus_client.generate_latest(registry),
+        media_type=prometheus_client.CONTENT_TYPE_LATEST,
+    )
+
+
+def mount(app: fastapi.FastAPI, path: str):
+    if prometheus_client is not None:
+        app.get(path, include_in_schema=False)(metrics)
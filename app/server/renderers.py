@@ -0,0 +1,218 @@
+"""Routing of render requests across a pool of renderer nodes."""
+
+import asyncio
+import logging
+import random
+import time
+from collections import deque
+
+import httpx
+
+from .clients import clients
+from .config import Settings
+from .resilience import is_overload
+
+MIN_LATENCY_SAMPLES = 20
+
+
+class RendererBackend:
+    def __init__(self, url: str, samples: int = 200):
+        self.url = url.rstrip("/")
+        self.outstanding = 0
+        self.failures = 0
+        self.down_until = 0.0
+        self.samples = samples
+        # per path, as a `/bulk` call takes about N single renders
+        self.latencies: dict[str, deque[float]] = {}
+
+    def endpoint(self, path: str = "") -> str:
+        """`path` relative to the node url, e.g. `/bulk` or the health path."""
+        return f"{self.url}{path}"
+
+    @property
+    def healthy(self) -> bool:
+        return time.monotonic() >= self.down_until
+
+    def mark_down(self, seconds: float):
+        if self.healthy:
+            logging.warning(f"Renderer {self.url} marked down for {seconds}s")
+        self.down_until = time.monotonic() + seconds
+
+    def record_success(self, latency: float, path: str = ""):
+        self.failures = 0
+        self.down_until = 0.0
+        if path not in self.latencies:
+            self.latencies[path] = deque(maxlen=self.samples)
+        self.latencies[path].append(latency)
+
+    def record_failure(self, max_failures: int, cooldown: float):
+        self.failures += 1
+        if self.failures >= max_failures:
+            self.mark_down(cooldown)
+
+    def stats(self) -> dict:
+        p95 = {}
+        for path, latencies in self.latencies.items():
+            latencies = sorted(latencies)
+            p95[path or "/"] = latencies[int(len(latencies) * 0.95)]
+        return {
+            "url": self.url,
+            "healthy": self.healthy,
+            "outstanding": self.outstanding,
+            "failures": self.failures,
+            "p95": p95,
+        }
+
+
+class RendererPool:
+    """Least-outstanding-requests routing over healthy renderer nodes.
+
+    Nodes are marked down for `cooldown` seconds after `max_failures`
+    consecutive overload errors, and by the optional health check. With
+    `hedge`, a request still running after the pool's recent
+    `hedge_percentile` latency for its path is duplicated on another node;
+    the first successful response wins and the other request is cancelled.
+    """
+
+    def __init__(
+        self,
+        urls: list[str],
+        max_failures: int = 3,
+        cooldown: float = 30,
+        hedge: bool = False,
+        hedge_percentile: float = 95,
+    ):
+        self.backends = [RendererBackend(url) for url in urls]
+        self.max_failures = max_failures
+        self.cooldown = cooldown
+        self.hedge = hedge
+        self.hedge_percentile = hedge_percentile
+        self.hedged = 0
+        self.hedge_wins = 0
+        self._health_task: asyncio.Task | None = None
+
+    def pick(self, exclude: RendererBackend | None = None) -> RendererBackend | None:
+        candidates = [b for b in self.backends if b is not exclude]
+        healthy = [b for b in candidates if b.healthy]
+        # with every node down, keep trying rather than failing outright
+        candidates = healthy or candidates
+        if not candidates:
+            return None
+        least = min(b.outstanding for b in candidates)
+        return random.choice([b for b in candidates if b.outstanding == least])
+
+    def hedge_delay(self, path: str = "") -> float | None:
+        latencies = sorted(
+            latency
+            for backend in self.backends
+            for latency in backend.latencies.get(path, ())
+        )
+        if len(latencies) < MIN_LATENCY_SAMPLES:
+            return None
+        index = min(
+            len(latencies) - 1, int(len(latencies) * self.hedge_percentile / 100)
+        )
+        return latencies[index]
+
+    async def _send(
+        self, backend: RendererBackend, path: str, **kwargs
+    ) -> httpx.Response:
+        backend.outstanding += 1
+        start = time.monotonic()
+        try:
+            r = await clients.renderer.post(backend.endpoint(path), **kwargs)
+            r.raise_for_status()
+        except Exception as e:
+            if is_overload(e):
+                backend.record_failure(self.max_failures, self.cooldown)
+            raise
+        finally:
+            backend.outstanding -= 1
+        backend.record_success(time.monotonic() - start, path)
+        return r
+
+    async def post(self, path: str = "", hedge: bool = False, **kwargs):
+        """POST `path` (relative to the node url) to the best node."""
+        first = self.pick()
+        primary = asyncio.ensure_future(self._send(first, path, **kwargs))
+        delay = self.hedge_delay(path) if hedge and self.hedge else None
+        if delay is None or len(self.backends) < 2:
+            return await primary
+
+        done, _ = await asyncio.wait({primary}, timeout=delay)
+        if done:
+            return primary.result()
+
+        self.hedged += 1
+        secondary = asyncio.ensure_future(
+            self._send(self.pick(exclude=first), path, **kwargs)
+        )
+        pending = {primary, secondary}
+        try:
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if task.exception() is None:
+                        self.hedge_wins += task is secondary
+                        return task.result()
+            # both failed: surface the primary's error
+            return primary.result()
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def check_health(self):
+        for backend in self.backends:
+            url = backend.endpoint(Settings.RENDER_HEALTH_PATH)
+            try:
+                r = await clients.renderer.get(url, timeout=5)
+                healthy = r.is_success
+            except httpx.HTTPError:
+                healthy = False
+            if healthy:
+                backend.down_until = 0.0
+                backend.failures = 0
+            else:
+                backend.mark_down(self.cooldown)
+
+    async def _health_loop(self, interval: float):
+        while True:
+            try:
+                await self.check_health()
+            except Exception as e:
+                logging.warning(f"Renderer health check failed: {e}")
+            await asyncio.sleep(interval)
+
+    def start(self, interval: float):
+        if self._health_task is None:
+            self._health_task = asyncio.create_task(self._health_loop(interval))
+
+    async def stop(self):
+        if self._health_task is not None:
+            self._health_task.cancel()
+            await asyncio.gather(self._health_task, return_exceptions=True)
+            self._health_task = None
+
+    def stats(self) -> dict:
+        return {
+            "backends": [backend.stats() for backend in self.backends],
+            "hedge_delay": self.hedge_delay() if self.hedge else None,
+            "hedged": self.hedged,
+            "hedge_wins": self.hedge_wins,
+        }
+
+
+def render_urls() -> list[str]:
+    urls = [url.strip() for url in Settings.MWJ_RENDER_URLS.split(",")]
+    return [url for url in urls if url] or [Settings.MWJ_RENDER_URL]
+
+
+renderers = RendererPool(
+    render_urls(),
+    max_failures=Settings.RENDER_BACKEND_MAX_FAILURES,
+    cooldown=Settings.RENDER_BACKEND_COOLDOWN,
+    hedge=Settings.RENDER_HEDGE,
+    hedge_percentile=Settings.RENDER_HEDGE_PERCENTILE,
+)
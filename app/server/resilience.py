@@ -0,0 +1,273 @@
+"""Client-side protection for upstream services.
+
+Each `Upstream` combines an AIMD concurrency limiter, a circuit breaker and
+retries with jittered exponential backoff, so a slow or failing upstream
+sees less traffic from us instead of a retry storm.
+"""
+
+import asyncio
+import logging
+import random
+import time
+from contextlib import asynccontextmanager
+from typing import Awaitable, Callable, TypeVar
+
+import httpx
+from fastapi_mongo_base.core.exceptions import BaseHTTPException
+
+from .config import Settings
+
+T = TypeVar("T")
+
+
+class UpstreamUnavailable(BaseHTTPException):
+    def __init__(self, upstream: str, reason: str):
+        super().__init__(
+            status_code=503,
+            error="upstream_unavailable",
+            message=f"{upstream} is unavailable: {reason}",
+        )
+
+
+class LimitExceeded(Exception):
+    """Raised when a caller waited too long for a limiter slot."""
+
+
+def is_overload(e: Exception) -> bool:
+    """Errors that mean the upstream is struggling, so backing off helps."""
+    if isinstance(e, httpx.HTTPStatusError):
+        return e.response.status_code == 429 or e.response.status_code >= 500
+    return isinstance(e, httpx.TransportError)
+
+
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+    """Full-jitter exponential backoff for the given zero-based attempt."""
+    return random.uniform(0, min(cap, base * 2**attempt))
+
+
+class AIMDLimiter:
+    """Concurrency limit that grows by one per window of successful calls and
+    is cut by `decrease` on overload or when latency exceeds `latency_target`.
+
+    Callers wait up to `queue_timeout` seconds for a slot and are shed after.
+    """
+
+    def __init__(
+        self,
+        initial: int,
+        min_limit: int = 1,
+        max_limit: int = 100,
+        decrease: float = 0.7,
+        latency_target: float = 0,
+        queue_timeout: float = 30,
+    ):
+        self.limit = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.decrease = decrease
+        self.latency_target = latency_target
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self.queued = 0
+        self.shed = 0
+        self._condition = asyncio.Condition()
+
+    def _has_slot(self) -> bool:
+        return self.in_flight < int(self.limit)
+
+    def _on_success(self, latency: float):
+        if self.latency_target and latency > self.latency_target:
+            self._on_overload()
+        else:
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+
+    def _on_overload(self):
+        self.limit = max(self.min_limit, self.limit * self.decrease)
+
+    @asynccontextmanager
+    async def slot(self):
+        async with self._condition:
+            self.queued += 1
+            try:
+                await asyncio.wait_for(
+                    self._condition.wait_for(self._has_slot), self.queue_timeout
+                )
+            except asyncio.TimeoutError:
+                self.shed += 1
+                raise LimitExceeded()
+            finally:
+                self.queued -= 1
+            self.in_flight += 1
+
+        start = time.monotonic()
+        try:
+            yield
+        except Exception as e:
+            if is_overload(e):
+                self._on_overload()
+            raise
+        else:
+            self._on_success(time.monotonic() - start)
+        finally:
+            async with self._condition:
+                self.in_flight -= 1
+                self._condition.notify_all()
+
+    def stats(self) -> dict:
+        return {
+            "limit": round(self.limit, 2),
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "shed": self.shed,
+        }
+
+
+class CircuitBreaker:
+    """Opens after `failure_threshold` consecutive overload failures and lets
+    a single probe through once `reset_timeout` seconds have passed."""
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.rejected = 0
+        self.opened_at = 0.0
+        self._probing = False
+
+    def allow(self) -> bool:
+        if self.state == "closed":
+            return True
+        if self.state == "open":
+            if time.monotonic() - self.opened_at < self.reset_timeout:
+                return False
+            self.state = "half_open"
+        if self._probing:
+            return False
+        self._probing = True
+        return True
+
+    def release(self):
+        """Give back a probe that was allowed but never sent."""
+        self._probing = False
+
+    def record_success(self):
+        self.state = "closed"
+        self.failures = 0
+        self._probing = False
+
+    def record_failure(self):
+        self.failures += 1
+        self._probing = False
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            if self.state != "open":
+                logging.warning(f"Circuit opened after {self.failures} failures")
+            self.state = "open"
+            self.opened_at = time.monotonic()
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "failures": self.failures,
+            "rejected": self.rejected,
+        }
+
+
+class Upstream:
+    def __init__(
+        self,
+        name: str,
+        limiter: AIMDLimiter,
+        breaker: CircuitBreaker,
+        attempts: int = 3,
+        base_delay: float = 0.5,
+        max_delay: float = 8,
+    ):
+        self.name = name
+        self.limiter = limiter
+        self.breaker = breaker
+        self.attempts = attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    async def _attempt(self, func: Callable[[], Awaitable[T]]) -> T:
+        if not self.breaker.allow():
+            self.breaker.rejected += 1
+            raise UpstreamUnavailable(self.name, "circuit open")
+        try:
+            async with self.limiter.slot():
+                result = await func()
+        except LimitExceeded:
+            # nothing was sent, so the breaker learns nothing from this
+            self.breaker.release()
+            raise UpstreamUnavailable(self.name, "too many requests in flight")
+        except Exception as e:
+            if is_overload(e):
+                self.breaker.record_failure()
+            else:
+                self.breaker.record_success()
+            raise
+        except BaseException:
+            # a cancelled call has no outcome either, but must give back a
+            # half-open probe or the breaker never closes again
+            self.breaker.release()
+            raise
+        self.breaker.record_success()
+        return result
+
+    async def call(
+        self, func: Callable[[], Awaitable[T]], attempts: int | None = None
+    ) -> T:
+        """Run `func`, retrying overload errors with jittered backoff.
+
+        Other errors, and calls rejected by the breaker or shed by the
+        limiter, are raised at once so they add no load.
+        """
+        attempts = attempts or self.attempts
+        for attempt in range(attempts):
+            try:
+                return await self._attempt(func)
+            except UpstreamUnavailable:
+                raise
+            except Exception as e:
+                if not is_overload(e) or attempt == attempts - 1:
+                    raise
+                delay = backoff_delay(attempt, self.base_delay, self.max_delay)
+                logging.warning(
+                    f"{self.name} attempt {attempt + 1} failed, "
+                    f"retrying in {delay:.2f}s: {e}"
+                )
+                await asyncio.sleep(delay)
+
+    def stats(self) -> dict:
+        return {"limiter": self.limiter.stats(), "breaker": self.breaker.stats()}
+
+
+def create_upstream(name: str, max_limit: int) -> Upstream:
+    return Upstream(
+        name,
+        AIMDLimiter(
+            initial=max(Settings.UPSTREAM_MIN_CONCURRENCY, max_limit // 2),
+            min_limit=Settings.UPSTREAM_MIN_CONCURRENCY,
+            max_limit=max_limit,
+            latency_target=Settings.UPSTREAM_LATENCY_TARGET,
+            queue_timeout=Settings.UPSTREAM_QUEUE_TIMEOUT,
+        ),
+        CircuitBreaker(
+            failure_threshold=Settings.BREAKER_FAILURE_THRESHOLD,
+            reset_timeout=Settings.BREAKER_RESET_TIMEOUT,
+        ),
+        attempts=Settings.RETRY_ATTEMPTS,
+        base_delay=Settings.RETRY_BASE_DELAY,
+        max_delay=Settings.RETRY_MAX_DELAY,
+    )
+
+
+upstreams = {
+    "renderer": create_upstream("renderer", Settings.RENDER_MAX_CONNECTIONS),
+    "ufiles": create_upstream("ufiles", Settings.HTTP_MAX_CONNECTIONS),
+}
+
+
+def stats() -> dict:
+    return {name: upstream.stats() for name, upstream in upstreams.items()}
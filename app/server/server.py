@@ -1,12 +1,59 @@
+import asyncio
+from contextlib import asynccontextmanager, suppress
+
+import fastapi
+from apps.render import jobs, services
 from apps.render.routes import router as render_router
 from apps.render.routes import router_group as render_group_router
 from apps.template.routes import router as template_router
 from apps.template.routes import router_group as template_group_router
+from apps.template.services import watch_template_changes
 from fastapi_mongo_base.core import app_factory
 
-from . import config
+from . import config, metrics, resilience
+from .clients import clients
+from .executor import cpu_executor
+from .renderers import renderers
+
+
+@asynccontextmanager
+async def lifespan(app: fastapi.FastAPI):
+    async with app_factory.lifespan(app):
+        watcher = None
+        if config.Settings.TEMPLATE_CHANGE_STREAM:
+            watcher = asyncio.create_task(watch_template_changes())
+        if config.Settings.RENDER_HEALTH_PATH:
+            renderers.start(config.Settings.RENDER_HEALTH_INTERVAL)
+        await services.warmup()
+        if config.Settings.RENDER_WORKERS > 0:
+            jobs.workers.start()
+            if config.Settings.RENDER_QUEUE_BACKEND == "memory":
+                await jobs.requeue_pending()
+        yield
+        await jobs.workers.stop()
+        await renderers.stop()
+        if watcher is not None:
+            watcher.cancel()
+            with suppress(asyncio.CancelledError):
+                await watcher
+        await clients.aclose()
+        cpu_executor.shutdown()
+        services.local_executor.shutdown()
+
 
-app = app_factory.create_app(settings=config.Settings(), original_host_middleware=True)
+app = app_factory.create_app(
+    settings=config.Settings(), original_host_middleware=True, lifespan_func=lifespan
+)
+app.get(f"{config.Settings.base_path}/executor", include_in_schema=False)(
+    cpu_executor.stats
+)
+app.get(f"{config.Settings.base_path}/upstreams", include_in_schema=False)(
+    resilience.stats
+)
+app.get(f"{config.Settings.base_path}/renderers", include_in_schema=False)(
+    renderers.stats
+)
+metrics.mount(app, f"{config.Settings.base_path}/metrics")
 app.include_router(render_router, prefix=f"{config.Settings.base_path}")
 app.include_router(render_group_router, prefix=f"{config.Settings.base_path}")
 app.include_router(template_router, prefix=f"{config.Settings.base_path}")
@@ -0,0 +1,47 @@
+"""Streaming responses for endpoints that report results as they complete.
+
+Item streams may yield None to send a keep-alive (an SSE comment or a blank
+NDJSON line) through proxies that close idle connections.
+"""
+
+import json
+from typing import AsyncIterator
+
+import fastapi
+from fastapi.responses import StreamingResponse
+
+
+async def ndjson_lines(items: AsyncIterator[dict | None]) -> AsyncIterator[str]:
+    async for item in items:
+        if item is None:
+            yield "\n"
+            continue
+        yield json.dumps(item, ensure_ascii=False) + "\n"
+
+
+async def sse_events(
+    items: AsyncIterator[dict | None], event: str = "message"
+) -> AsyncIterator[str]:
+    async for item in items:
+        if item is None:
+            yield ": keepalive\n\n"
+            continue
+        yield f"event: {event}\ndata: {json.dumps(item, ensure_ascii=False)}\n\n"
+
+
+def wants_event_stream(request: fastapi.Request) -> bool:
+    return "text/event-stream" in request.headers.get("accept", "")
+
+
+def stream_response(
+    request: fastapi.Request, items: AsyncIterator[dict | None], event: str = "message"
+) -> StreamingResponse:
+    """Stream `items` as server-sent events if the client asks for them,
+    otherwise as newline-delimited JSON."""
+    if wants_event_stream(request):
+        return StreamingResponse(
+            sse_events(items, event),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+    return StreamingResponse(ndjson_lines(items), media_type="application/x-ndjson")
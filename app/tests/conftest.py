@@ -0,0 +1,35 @@
+import os
+import uuid
+
+import pytest
+from benchmarks.fakes import BENCH_ENV, FakeUpstreams
+
+# settings are read at import time, so the app sees the stand-in upstreams
+os.environ.update(BENCH_ENV)
+os.environ["MWJ_RENDER_URLS"] = BENCH_ENV["MWJ_RENDER_URL"]
+
+from server.clients import clients  # noqa: E402
+
+# every pooled upstream client is routed to the stand-ins
+clients.transport = FakeUpstreams(latency=0.05, jitter=0).transport()
+
+
+@pytest.fixture
+def init_db():
+    """Returns a coroutine function that sets up beanie on a fresh mongomock
+    database; mongomock ignores partial indexes, so `skip_indexes` is needed
+    once renders without an idempotency key are stored."""
+
+    async def init(skip_indexes: bool = False):
+        from apps.render.models import Render, RenderGroup
+        from apps.template.models import Template, TemplateGroup
+        from beanie import init_beanie
+        from mongomock_motor import AsyncMongoMockClient
+
+        await init_beanie(
+            database=AsyncMongoMockClient()[f"test_{uuid.uuid4().hex[:8]}"],
+            document_models=[Render, RenderGroup, Template, TemplateGroup],
+            skip_indexes=skip_indexes,
+        )
+
+    return init
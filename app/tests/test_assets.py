@@ -0,0 +1,35 @@
+import asyncio
+import base64
+from io import BytesIO
+
+from apps.render.assets import Asset, AssetCache, encode_image
+from benchmarks.fakes import noise_png
+from PIL import Image
+
+
+def asset(url: str, size: int) -> Asset:
+    return Asset(url=url, digest=url.rsplit("/", 1)[-1], data_url="a" * size)
+
+
+def test_disk_tier_is_trimmed_to_its_budget(tmp_path):
+    async def main():
+        cache = AssetCache(max_bytes=2**20, directory=tmp_path, max_disk_bytes=3000)
+        for i in range(10):
+            await cache._write_disk(asset(f"https://assets.test/{i:02}", 1000))
+
+        size = sum(
+            path.stat().st_size for path in tmp_path.rglob("*") if path.is_file()
+        )
+        assert size <= 3000
+        assert await cache._read_disk("https://assets.test/09") is not None
+        assert await cache._read_disk("https://assets.test/00") is None
+
+    asyncio.run(main())
+
+
+def test_assets_keep_the_default_jpeg_quality():
+    png = noise_png(32, 32)
+    baseline = BytesIO()
+    Image.open(BytesIO(png)).convert("RGB").save(baseline, format="JPEG")
+    encoded = encode_image(png).split(",", 1)[1]
+    assert base64.b64decode(encoded) == baseline.getvalue()
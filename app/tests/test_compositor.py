@@ -0,0 +1,71 @@
+import asyncio
+import uuid
+
+import pytest
+from apps.render import compositor
+from apps.render.services import RenderBackend
+
+COLOR_LAYER = {"type": "color", "color": "#ff0000", "x": 0, "y": 0, "width": 10}
+
+
+def template(*layers: dict) -> dict:
+    return {"width": 20, "height": 20, "layers": list(layers)}
+
+
+def test_supports_known_layers():
+    assert compositor.supports(template(COLOR_LAYER), "")
+
+
+@pytest.mark.parametrize(
+    "layer",
+    [
+        COLOR_LAYER | {"left": 0, "top": 0},
+        COLOR_LAYER | {"x": "10%"},
+        {"type": "image", "src": "", "fit": "tile"},
+        {"type": "color"},
+    ],
+)
+def test_rejects_unknown_keys_and_values(layer: dict):
+    assert not compositor.supports(template(layer), "")
+
+
+def test_rejects_unknown_canvas_keys():
+    assert not compositor.supports(template(COLOR_LAYER) | {"scale": 2}, "")
+
+
+def test_render_backend_is_abstract():
+    with pytest.raises(TypeError):
+        RenderBackend()
+
+
+def test_bulk_leaves_locally_supported_renders_out(monkeypatch, init_db):
+    from apps.render import services
+    from apps.render.models import Render
+
+    async def reuse_cached_render(render):
+        return None
+
+    async def render_bulk(mwjs, name):
+        sent.extend(mwjs)
+        return ["image"] * len(mwjs)
+
+    sent = []
+    monkeypatch.setattr(services, "reuse_cached_render", reuse_cached_render)
+    monkeypatch.setattr(services, "render_bulk", render_bulk)
+    monkeypatch.setattr(
+        services, "render_backends", services.create_render_backends("prefer")
+    )
+    monkeypatch.setattr(services.Settings, "RENDER_BULK_ENDPOINT", True)
+    remote = template(COLOR_LAYER | {"left": 0})
+
+    async def main():
+        await init_db()
+        user_id = uuid.uuid4()
+        renders = [Render(template_name="t", user_id=user_id) for _ in range(2)]
+        return await services.render_bulk_images(
+            renders, [template(COLOR_LAYER), remote]
+        )
+
+    images = asyncio.run(main())
+    assert sent == [remote]
+    assert images == {1: "image"}
@@ -0,0 +1,34 @@
+import asyncio
+import uuid
+
+import pytest
+from apps.render import events
+from apps.render.models import Render
+from apps.render.schemas import RenderResult
+
+
+@pytest.mark.parametrize(
+    "results, stage",
+    [
+        (
+            [RenderResult(url="https://ufiles.bench/a.jpg", width=1, height=1)],
+            "completed",
+        ),
+        ([], "error"),
+    ],
+)
+def test_legacy_render_stream_finishes(init_db, results, stage):
+    async def main():
+        await init_db(skip_indexes=True)
+        render = Render(template_name="bench-0", user_id=uuid.uuid4(), results=results)
+        await render.insert()
+        # stored before renders had a status
+        await Render.get_motor_collection().update_one(
+            {"_id": render.id}, {"$unset": {"status": ""}}
+        )
+
+        stream = events.stream_events(await Render.get(render.id))
+        return [event async for event in stream]
+
+    streamed = asyncio.run(asyncio.wait_for(main(), timeout=5))
+    assert [event["stage"] for event in streamed] == [stage]
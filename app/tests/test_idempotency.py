@@ -0,0 +1,58 @@
+import asyncio
+import uuid
+
+import fastapi
+import pytest
+from benchmarks import scenarios
+from fastapi_mongo_base.core.exceptions import BaseHTTPException
+from starlette.requests import Request
+
+
+def keyed_request(key: str) -> Request:
+    return Request(
+        {
+            "type": "http",
+            "method": "POST",
+            "path": "/",
+            "headers": [(b"idempotency-key", key.encode())],
+            "query_string": b"",
+        }
+    )
+
+
+def test_reused_key_with_other_payload_is_not_joined(monkeypatch, init_db):
+    async def main():
+        from apps.render.routes import RenderRouter
+
+        await init_db()
+        await scenarios.seed(2, 1, 2)
+
+        user_id = uuid.uuid4()
+
+        async def get_user_id(self, request):
+            return user_id
+
+        monkeypatch.setattr(RenderRouter, "get_user_id", get_user_id)
+        router = RenderRouter()
+        first = {"template_name": "bench-0", "texts": ["hello"]}
+        second = {"template_name": "bench-1", "texts": ["something else"]}
+
+        results = await asyncio.gather(
+            router.create_render(keyed_request("K1"), fastapi.Response(), first),
+            router.create_render(keyed_request("K1"), fastapi.Response(), second),
+            return_exceptions=True,
+        )
+        renders = [result for result in results if not isinstance(result, Exception)]
+        errors = [result for result in results if isinstance(result, Exception)]
+        assert len(renders) == 1 and len(errors) == 1
+        assert isinstance(errors[0], BaseHTTPException)
+        assert errors[0].status_code == 422
+
+        # the payload that won the key still gets its render back
+        winner = first if renders[0].template_name == "bench-0" else second
+        again = await router.create_render(
+            keyed_request("K1"), fastapi.Response(), winner
+        )
+        assert again.uid == renders[0].uid
+
+    asyncio.run(main())
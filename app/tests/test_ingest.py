@@ -0,0 +1,50 @@
+import asyncio
+import base64
+import uuid
+
+import pytest
+from benchmarks.fakes import noise_png
+from fastapi_mongo_base.core.exceptions import BaseHTTPException
+from server.config import Settings
+
+IMAGE = "data:image/png;base64," + base64.b64encode(noise_png(8, 8)).decode()
+
+
+def ingest(data: dict) -> dict:
+    from apps.render.ingest import ingest_images
+
+    return asyncio.run(ingest_images(data, uuid.uuid4()))
+
+
+def test_list_form_images_are_kept_inline():
+    data = {"images": ["", IMAGE]}
+    assert ingest(data) == data
+
+
+def test_dict_form_images_and_logo_are_uploaded():
+    data = ingest({"images": {"image": IMAGE}, "logo": IMAGE})
+    assert data["images"]["image"].startswith("https://")
+    assert data["logo"] == data["images"]["image"]
+
+
+def test_size_is_checked_before_rejecting(monkeypatch):
+    monkeypatch.setattr(Settings, "RENDER_INLINE_IMAGES", "reject")
+    monkeypatch.setattr(Settings, "RENDER_INLINE_IMAGE_MAX_BYTES", 16)
+    with pytest.raises(BaseHTTPException) as e:
+        ingest({"images": ["", IMAGE]})
+    assert e.value.status_code == 413
+
+
+def test_uploads_work_after_clients_are_closed():
+    from apps.render.ingest import ingest_images
+    from server.clients import clients
+
+    async def run():
+        first = await ingest_images({"logo": IMAGE}, uuid.uuid4())
+        await clients.aclose()
+        second = await ingest_images({"logo": IMAGE}, uuid.uuid4())
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert first["logo"].startswith("https://")
+    assert second["logo"].startswith("https://")
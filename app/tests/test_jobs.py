@@ -0,0 +1,54 @@
+import asyncio
+import uuid
+from datetime import datetime, timedelta
+
+from apps.render import jobs
+from apps.render.models import Render
+from apps.render.schemas import RenderStatus
+
+
+async def create_render(status: RenderStatus, **data) -> Render:
+    render = Render(
+        template_name="bench-0", user_id=uuid.uuid4(), status=status, **data
+    )
+    return await render.insert()
+
+
+def test_stop_requeues_unfinished_jobs(monkeypatch, init_db):
+    async def main():
+        await init_db(skip_indexes=True)
+        monkeypatch.setattr(jobs, "run_render", lambda item: asyncio.sleep(10))
+        monkeypatch.setattr(jobs, "queue", jobs.MemoryJobQueue())
+
+        render = await create_render(RenderStatus.pending)
+        pool = jobs.RenderWorkerPool(size=2, drain_timeout=0.05, stale_after=0)
+        pool.start()
+        await jobs.enqueue(render)
+        await asyncio.sleep(0.05)
+        assert (await Render.get(render.id)).status == RenderStatus.processing
+
+        await pool.stop()
+        assert (await Render.get(render.id)).status == RenderStatus.pending
+        assert (await jobs.queue.get()).uid == render.uid
+
+    asyncio.run(main())
+
+
+def test_stale_jobs_are_requeued(monkeypatch, init_db):
+    async def main():
+        await init_db(skip_indexes=True)
+        monkeypatch.setattr(jobs, "queue", jobs.MemoryJobQueue())
+
+        long_ago = datetime.now() - timedelta(hours=1)
+        stale = await create_render(RenderStatus.processing)
+        await Render.find_one({"_id": stale.id}).update(
+            {"$set": {"updated_at": long_ago}}
+        )
+        await create_render(RenderStatus.processing)
+
+        await jobs.requeue_stale(600)
+        assert (await Render.get(stale.id)).status == RenderStatus.pending
+        assert (await jobs.queue.get()).uid == stale.uid
+        assert jobs.queue._queue.empty()
+
+    asyncio.run(main())
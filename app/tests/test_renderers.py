@@ -0,0 +1,32 @@
+import asyncio
+
+import httpx
+from server.clients import clients
+from server.config import Settings
+from server.renderers import MIN_LATENCY_SAMPLES, RendererPool
+
+
+def test_hedge_delay_ignores_bulk_latencies():
+    pool = RendererPool(["http://renderer-0", "http://renderer-1"], hedge=True)
+    for backend in pool.backends:
+        for _ in range(MIN_LATENCY_SAMPLES):
+            backend.record_success(0.2)
+            backend.record_success(5.0, "/bulk")
+
+    assert pool.hedge_delay() == 0.2
+    assert pool.hedge_delay("/bulk") == 5.0
+
+
+def test_health_checks_use_the_request_url_builder(monkeypatch):
+    requested = []
+
+    async def get(url, **kwargs):
+        requested.append(url)
+        return httpx.Response(200)
+
+    monkeypatch.setattr(Settings, "RENDER_HEALTH_PATH", "/health")
+    monkeypatch.setattr(clients.renderer, "get", get)
+    pool = RendererPool(["http://renderer-0/render/"])
+    asyncio.run(pool.check_health())
+    assert requested == [pool.backends[0].endpoint("/health")]
+    assert requested == ["http://renderer-0/render/health"]
@@ -0,0 +1,61 @@
+import asyncio
+
+import httpx
+import pytest
+from server.resilience import AIMDLimiter, CircuitBreaker, Upstream, UpstreamUnavailable
+
+
+def overloaded():
+    request = httpx.Request("POST", "http://renderer")
+    raise httpx.HTTPStatusError(
+        "unavailable", request=request, response=httpx.Response(503, request=request)
+    )
+
+
+def test_cancelled_probe_releases_breaker():
+    async def main():
+        upstream = Upstream(
+            "renderer",
+            AIMDLimiter(4),
+            CircuitBreaker(failure_threshold=1, reset_timeout=0.01),
+            attempts=1,
+        )
+
+        async def fail():
+            overloaded()
+
+        with pytest.raises(httpx.HTTPStatusError):
+            await upstream.call(fail)
+        assert upstream.breaker.state == "open"
+
+        await asyncio.sleep(0.02)
+        probe = asyncio.create_task(upstream.call(lambda: asyncio.sleep(10)))
+        await asyncio.sleep(0.01)
+        probe.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await probe
+
+        async def ok():
+            return "ok"
+
+        assert await upstream.call(ok) == "ok"
+        assert upstream.breaker.state == "closed"
+
+    asyncio.run(main())
+
+
+def test_open_breaker_rejects():
+    async def main():
+        upstream = Upstream(
+            "renderer", AIMDLimiter(4), CircuitBreaker(failure_threshold=1), attempts=1
+        )
+
+        async def fail():
+            overloaded()
+
+        with pytest.raises(httpx.HTTPStatusError):
+            await upstream.call(fail)
+        with pytest.raises(UpstreamUnavailable):
+            await upstream.call(fail)
+
+    asyncio.run(main())
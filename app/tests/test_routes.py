@@ -0,0 +1,117 @@
+import asyncio
+import base64
+import uuid
+
+import fastapi
+import pytest
+from benchmarks import scenarios
+from benchmarks.fakes import noise_png
+from starlette.requests import Request
+
+
+def plain_request(body: bytes = b"{}") -> Request:
+    async def receive():
+        return {"type": "http.request", "body": body}
+
+    return Request(
+        {
+            "type": "http",
+            "method": "POST",
+            "path": "/",
+            "headers": [],
+            "query_string": b"",
+        },
+        receive,
+    )
+
+
+def test_sync_render_without_key_is_stored_as_processing(monkeypatch, init_db):
+    async def main():
+        from apps.render import routes
+        from apps.render.models import Render
+        from apps.render.routes import RenderRouter
+
+        await init_db(skip_indexes=True)
+        await scenarios.seed(1, 1, 1)
+        user_id = uuid.uuid4()
+
+        async def get_user_id(self, request):
+            return user_id
+
+        statuses = []
+
+        async def run_render(item):
+            statuses.append((await Render.get(item.id)).status)
+            return item
+
+        monkeypatch.setattr(RenderRouter, "get_user_id", get_user_id)
+        monkeypatch.setattr(routes, "run_render", run_render)
+        data = {"template_name": "bench-0", "texts": ["hello"], "use_cache": False}
+        await RenderRouter().create_render(plain_request(), fastapi.Response(), data)
+        assert statuses == ["processing"]
+
+    asyncio.run(main())
+
+
+@pytest.mark.parametrize("background", [True, False])
+def test_inline_logo_is_stored_as_url(monkeypatch, init_db, background):
+    async def main():
+        from apps.render import jobs
+        from apps.render.models import Render
+        from apps.render.routes import RenderRouter
+
+        await init_db(skip_indexes=True)
+        await scenarios.seed(1, 1, 1)
+        user_id = uuid.uuid4()
+
+        async def get_user_id(self, request):
+            return user_id
+
+        monkeypatch.setattr(RenderRouter, "get_user_id", get_user_id)
+        monkeypatch.setattr(jobs, "queue", jobs.MemoryJobQueue())
+        logo = "data:image/png;base64," + base64.b64encode(noise_png(8, 8)).decode()
+        data = {"template_name": "bench-0", "logo": logo, "use_cache": False}
+        render = await RenderRouter().create_render(
+            plain_request(), fastapi.Response(), data, background=background
+        )
+        stored = await Render.get(render.id)
+        assert stored.logo.startswith("https://")
+
+    asyncio.run(main())
+
+
+def test_variants_are_filled_per_batch(monkeypatch, init_db):
+    async def main():
+        from apps.render import variants as variants_module
+        from apps.render.models import Render
+        from apps.render.schemas import RenderVariantsCreateSchema
+        from server.config import Settings
+
+        await init_db(skip_indexes=True)
+        await scenarios.seed(1, 1, 1)
+        monkeypatch.setattr(Settings, "RENDER_VARIANTS_BATCH_SIZE", 2)
+        monkeypatch.setattr(Settings, "RENDER_BULK_CONCURRENCY", 1)
+
+        filled = []
+        fill_variant = variants_module.fill_variant
+
+        async def counting_fill(variant):
+            filled.append(variant.render.id)
+            return await fill_variant(variant)
+
+        monkeypatch.setattr(variants_module, "fill_variant", counting_fill)
+        data = RenderVariantsCreateSchema(
+            template_name="bench-0",
+            texts=[[f"text {i}"] for i in range(5)],
+            use_cache=False,
+        )
+        variants = await variants_module.prepare_variants(data, uuid.uuid4())
+        assert filled == []
+
+        done = [v async for v in variants_module.render_variants(variants)]
+        assert len(done) == 5 and len(filled) == 5
+        assert all(variant.template_data == {} for variant in done)
+        stored = await Render.find({"status": "completed"}).count()
+        assert stored == 5
+
+    asyncio.run(main())
@@ -0,0 +1,44 @@
+import asyncio
+from datetime import datetime
+
+import httpx
+from apps.render import services
+from apps.template.cache import compiled_templates
+from apps.template.models import Template
+from server.clients import clients
+from server.config import Settings
+
+
+def test_changed_template_body_is_recompiled(monkeypatch):
+    body = {"text": '{"title": "{{ title }}"}'}
+    fetches = []
+
+    def handle(request: httpx.Request) -> httpx.Response:
+        fetches.append(request.headers.get("If-None-Match"))
+        etag = f'"{hash(body["text"])}"'
+        if request.headers.get("If-None-Match") == etag:
+            return httpx.Response(304)
+        return httpx.Response(200, text=body["text"], headers={"ETag": etag})
+
+    async def main():
+        template = Template.model_construct(
+            name="revalidated",
+            url="https://templates.test/revalidated.json",
+            updated_at=datetime.now(),
+        )
+        first = await services.get_jinja_template(template)
+        assert await services.get_jinja_template(template) is first
+        assert len(fetches) == 1
+
+        monkeypatch.setattr(Settings, "TEMPLATE_REVALIDATE_AFTER", 0)
+        assert await services.get_jinja_template(template) is first
+        assert fetches[-1] is not None
+
+        body["text"] = '{"title": "{{ title }}!"}'
+        changed = await services.get_jinja_template(template)
+        assert changed.render(title="a") == '{"title": "a!"}'
+
+    monkeypatch.setattr(clients, "transport", httpx.MockTransport(handle))
+    monkeypatch.setitem(clients._clients, "templates", None)
+    compiled_templates.clear()
+    asyncio.run(main())
@@ -0,0 +1,30 @@
+"""Standalone render worker consuming the shared redis job queue."""
+
+import asyncio
+import logging
+
+from apps.render import jobs, services
+from fastapi_mongo_base.core import db
+from server.clients import clients
+from server.config import Settings
+from server.renderers import renderers
+
+
+async def main():
+    Settings.config_logger()
+    await db.init_mongo_db()
+    if Settings.RENDER_HEALTH_PATH:
+        renderers.start(Settings.RENDER_HEALTH_INTERVAL)
+    jobs.workers.start()
+    logging.info(f"Render worker started with {jobs.workers.size} workers")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await jobs.workers.stop()
+        await renderers.stop()
+        await clients.aclose()
+        services.local_executor.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())